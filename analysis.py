@@ -1,10 +1,34 @@
+import hashlib
+import json
+import math
 import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
-from PIL import Image, ImageStat
+from PIL import Image, ImageOps
 import logging
+import metrics
 
 logger = logging.getLogger(__name__)
 
+STAGE_SECONDS = metrics.histogram(
+    'plant_analysis_stage_seconds',
+    'Time spent in each DiseaseAnalyzer stage (predict: one observation per forward pass)',
+    'stage'
+)
+ANALYSIS_ERRORS = metrics.counter('plant_analysis_errors_total', 'Images that could not be analyzed')
+
+class LeafTiles:
+    """Model-ready leaf tiles cut from one image, with their top-left positions."""
+    
+    def __init__(self, tiles, positions, image_size, candidates):
+        self.tiles = tiles
+        self.positions = positions
+        self.image_size = image_size
+        self.candidates = candidates
+
 class DiseaseAnalyzer:
     
     DISEASE_DATABASE = {
@@ -22,127 +46,589 @@ class DiseaseAnalyzer:
         }
     }
     
-    def __init__(self):
+    MODEL_PATH = 'models/plant_disease_model.keras'
+    TFLITE_MODEL_PATH = 'models/plant_disease_model_int8.tflite'
+    # Written by tune_cascade.py
+    CASCADE_THRESHOLDS_PATH = 'models/cascade_thresholds.json'
+    
+    MODEL_INPUT_SIZE = 224
+    
+    # TFLite batches are padded up to one of these sizes (see _tflite_predict)
+    TFLITE_BATCH_BUCKETS = (1, 2, 4, 8, 16, 32)
+    
+    # Longest edge images are decoded to; None analyzes at full resolution
+    WORKING_RESOLUTION = 1024
+    
+    # JPEGs may decode down to this fraction of the working resolution when that
+    # lets libjpeg use a coarser DCT scale (e.g. 1/4 instead of 1/2 for 12MP photos)
+    DRAFT_MIN_SCALE = 0.7
+    
+    # Longest edge of the strided green mask used to find the leaf bounding box
+    ROI_MASK_SIDE = 512
+    
+    # Tiled mode: tiles with less than this fraction of leaf pixels are not classified
+    TILE_MIN_LEAF = 0.1
+    
+    def __init__(self, compiled_inference=True, jit_compile=False,
+                 backend='keras', tflite_path=None, num_threads=None,
+                 load_in_background=False, model_wait_timeout=0,
+                 working_resolution=WORKING_RESOLUTION, pixel_budget=None,
+                 tiled=False, tile_budget=32, tile_overlap=0.25, tile_batch_size=16,
+                 tta=False, tta_band=0.1, cascade=False, cascade_path=None, load_model=True):
+        if backend not in ('keras', 'tflite'):
+            raise ValueError(f"Unknown analyzer backend: {backend}")
+        
         self.model = None
         self.model_loaded = False
-        self._load_model()
+        self.backend = backend
+        if backend == 'tflite':
+            self.model_path = tflite_path or self.TFLITE_MODEL_PATH
+        else:
+            self.model_path = self.MODEL_PATH
+        self.model_fingerprint = None
+        self.compiled_inference = compiled_inference
+        self.jit_compile = jit_compile
+        self.num_threads = num_threads
+        self.working_resolution = working_resolution
+        self.pixel_budget = pixel_budget
+        self.tiled = tiled
+        self.tile_budget = max(1, int(tile_budget))
+        self.tile_overlap = min(max(float(tile_overlap), 0.0), 0.9)
+        self.tile_batch_size = max(1, int(tile_batch_size))
+        self.tta = tta
+        self.tta_band = max(0.0, float(tta_band))
+        self._cascade_fingerprint = None
+        self.cascade_thresholds = self._load_cascade_thresholds(cascade_path) if cascade else None
+        
+        # How many results came from the model, from rules accepted by the cascade,
+        # or from rules because the model was unavailable or failed
+        self._path_lock = threading.Lock()
+        self._path_counts = {'model': 0, 'cascade': 0, 'rules': 0}
+        self.model_wait_timeout = model_wait_timeout
+        self._model_file_signature = None
+        self._infer = None
+        
+        # 'loading' until _load_model finishes, then 'ready', 'unavailable' or 'failed';
+        # 'disabled' for rule-based analyzers built with load_model=False
+        self.model_state = 'loading'
+        self._model_ready = threading.Event()
+        if not load_model:
+            self.model_state = 'disabled'
+            self._model_ready.set()
+        elif load_in_background:
+            threading.Thread(target=self._load_model, name='model-loader', daemon=True).start()
+        else:
+            self._load_model()
     
     def _load_model(self):
+        start = time.perf_counter()
         try:
-            import tensorflow as tf
-            model_path = 'models/plant_disease_model.keras'
+            model_path = self.model_path
             
             if os.path.exists(model_path):
-                self.model = tf.keras.models.load_model(model_path)
+                signature = self._file_signature(model_path)
+                if self.backend == 'tflite':
+                    self._load_tflite_model(model_path)
+                else:
+                    import tensorflow as tf
+                    self.model = tf.keras.models.load_model(model_path)
+                    if self.compiled_inference:
+                        self._build_inference_fn(tf)
+                self.model_fingerprint = self._hash_file(model_path)
+                self._model_file_signature = signature
+                self._check_cascade_fingerprint()
                 self.model_loaded = True
-                logger.info(f"ML model loaded successfully from {model_path}")
+                self.model_state = 'ready'
+                logger.info(f"ML model loaded successfully from {model_path} ({self.backend} backend) "
+                            f"in {time.perf_counter() - start:.2f}s")
             else:
                 logger.warning(f"Model not found at {model_path}, using rule-based analysis")
                 self.model_loaded = False
+                self.model_state = 'unavailable'
         except Exception as e:
             logger.error(f"Failed to load ML model: {e}")
             self.model_loaded = False
+            self.model_state = 'failed'
+        finally:
+            self._model_ready.set()
+    
+    def delegate_model(self):
+        """
+        Mark the model as loading in other processes (AnalysisPool workers) on
+        behalf of this analyzer, which was built with load_model=False. Its
+        state stays 'loading' until adopt_worker_models() is called.
+        """
+        self.model_state = 'loading'
+        self._model_ready.clear()
+    
+    def adopt_worker_models(self, reports):
+        """
+        Take the model state from worker_model_report() dicts of the processes
+        doing inference: 'ready' only if every worker loaded the same model
+        file, so result fingerprints name a model only when results really
+        come from it.
+        """
+        states = {report['state'] for report in reports}
+        fingerprints = {(report['fingerprint'], report['signature']) for report in reports}
+        if states == {'ready'} and len(fingerprints) == 1:
+            self.model_fingerprint, signature = fingerprints.pop()
+            self._model_file_signature = tuple(signature)
+            self._check_cascade_fingerprint()
+            self.model_loaded = True
+            self.model_state = 'ready'
+        else:
+            self.model_loaded = False
+            self.model_state = states.pop() if len(states) == 1 and 'ready' not in states else 'failed'
+        logger.info(f"Worker models {self.model_state} ({', '.join(sorted(r['state'] for r in reports))})")
+        self._model_ready.set()
+    
+    def worker_model_report(self):
+        """This analyzer's model state, for adopt_worker_models() in the parent process."""
+        return {
+            'state': self.model_state,
+            'fingerprint': self.model_fingerprint,
+            'signature': self._model_file_signature
+        }
+    
+    def wait_for_model(self, timeout=None):
+        """Block until model loading has finished (or timeout); returns whether the model is usable."""
+        self._model_ready.wait(timeout)
+        return self.model_loaded and self.model is not None
+    
+    def _model_available(self):
+        """Whether this call should use the model, waiting up to model_wait_timeout while it loads."""
+        if not self._model_ready.is_set() and self.model_wait_timeout:
+            self._model_ready.wait(self.model_wait_timeout)
+        return self.model_loaded and self.model is not None
+    
+    def _load_tflite_model(self, model_path):
+        """Load a TFLite model exported by export_tflite.py and warm it up."""
+        try:
+            from ai_edge_litert.interpreter import Interpreter
+        except ImportError:
+            try:
+                from tflite_runtime.interpreter import Interpreter
+            except ImportError:
+                import tensorflow as tf
+                Interpreter = tf.lite.Interpreter
+        
+        self._tflite_class = Interpreter
+        # One interpreter per batch bucket, each allocated once for its fixed
+        # input shape; each holds mutable tensor buffers, so one invoke at a time
+        self._tflite_interpreters = {}
+        self._tflite_lock = threading.Lock()
+        interpreter, _ = self._tflite_interpreter(1)
+        self._tflite_input = interpreter.get_input_details()[0]
+        self._tflite_output = interpreter.get_output_details()[0]
+        self.model = interpreter
+        
+        size = self.MODEL_INPUT_SIZE
+        self._tflite_predict(np.zeros((1, size, size, 3), dtype=np.float32))
+    
+    def _tflite_interpreter(self, bucket):
+        """(interpreter, lock) for inputs of exactly `bucket` images, created on first use."""
+        with self._tflite_lock:
+            entry = self._tflite_interpreters.get(bucket)
+            if entry is None:
+                interpreter = self._tflite_class(model_path=self.model_path, num_threads=self.num_threads)
+                input_details = interpreter.get_input_details()[0]
+                if input_details['shape'][0] != bucket:
+                    interpreter.resize_tensor_input(input_details['index'], [bucket] + list(input_details['shape'][1:]))
+                interpreter.allocate_tensors()
+                entry = self._tflite_interpreters[bucket] = (interpreter, threading.Lock())
+            return entry
+    
+    def _tflite_predict(self, batch):
+        """
+        Score a batch with the TFLite interpreter. Batches are zero-padded up to
+        the next TFLITE_BATCH_BUCKETS size (larger ones are split), so the
+        varying sizes of micro-batches, TTA views and tile chunks reuse a few
+        preallocated interpreters instead of reallocating tensors per call.
+        """
+        largest = self.TFLITE_BATCH_BUCKETS[-1]
+        if len(batch) > largest:
+            return np.concatenate([
+                self._tflite_predict(batch[start:start + largest])
+                for start in range(0, len(batch), largest)
+            ])
+        
+        count = len(batch)
+        bucket = next(b for b in self.TFLITE_BATCH_BUCKETS if b >= count)
+        if bucket != count:
+            batch = np.concatenate([batch, np.zeros((bucket - count,) + batch.shape[1:], dtype=batch.dtype)])
+        
+        input_details = self._tflite_input
+        
+        # Full-int8 models take quantized input; dynamic-range models take float32
+        scale, zero_point = input_details['quantization']
+        if scale:
+            limits = np.iinfo(input_details['dtype'])
+            batch = np.clip(np.round(batch / scale + zero_point), limits.min, limits.max)
+        batch = batch.astype(input_details['dtype'])
+        
+        interpreter, lock = self._tflite_interpreter(bucket)
+        with lock:
+            interpreter.set_tensor(input_details['index'], batch)
+            interpreter.invoke()
+            scores = interpreter.get_tensor(self._tflite_output['index'])[:count]
+        
+        scale, zero_point = self._tflite_output['quantization']
+        if scale:
+            scores = (scores.astype(np.float32) - zero_point) * scale
+        return scores[:, 0]
+    
+    def _build_inference_fn(self, tf):
+        """
+        Wrap the model in a traced function with a fixed (None, 224, 224, 3) signature.
+        model.predict rebuilds a data adapter per call; the traced function does not.
+        """
+        model = self.model
+        size = self.MODEL_INPUT_SIZE
+        
+        @tf.function(
+            input_signature=[tf.TensorSpec(shape=(None, size, size, 3), dtype=tf.float32)],
+            jit_compile=self.jit_compile
+        )
+        def infer(images):
+            return model(images, training=False)
+        
+        try:
+            # Warm up so tracing (and XLA compilation) happens at load, not on the first upload
+            start = time.perf_counter()
+            infer(tf.zeros((1, size, size, 3), dtype=tf.float32))
+            self._infer = infer
+            mode = 'XLA' if self.jit_compile else 'graph'
+            logger.info(f"Compiled {mode} inference ready in {time.perf_counter() - start:.2f}s")
+        except Exception as e:
+            logger.warning(f"Compiled inference unavailable, using model.predict: {e}")
+            self._infer = None
+    
+    @staticmethod
+    def _file_signature(path):
+        stat = os.stat(path)
+        return stat.st_size, stat.st_mtime_ns
+    
+    @staticmethod
+    def _hash_file(path):
+        with open(path, 'rb') as f:
+            return hashlib.file_digest(f, 'sha256').hexdigest()
+    
+    @property
+    def model_version(self):
+        """Backend and short hash of the loaded model file, recorded with each model result."""
+        if self.model_fingerprint is None:
+            return None
+        return f"{self.backend}:{self.model_fingerprint[:12]}"
+    
+    def result_fingerprint(self):
+        """
+        Identify what produces analyze_image results, for keying cached results.
+        Returns None while the model is still loading, or when the model file
+        on disk no longer matches the loaded model.
+        """
+        if not self._model_ready.is_set():
+            return None
+        if not self.model_loaded:
+            return f"rule-based:{self._options_signature()}"
+        
+        try:
+            if self._file_signature(self.model_path) != self._model_file_signature:
+                return None
+        except OSError:
+            return None
+        return f"{self.backend}:{self.model_fingerprint}:{self._options_signature()}"
+    
+    def _options_signature(self):
+        """Analysis options that change results, as part of the result fingerprint."""
+        signature = f"res={self.working_resolution or 'full'}~{self.DRAFT_MIN_SCALE},budget={self.pixel_budget or 'exact'},orient=exif"
+        if self.tiled:
+            signature += f",tiles={self.tile_budget}@{self.tile_overlap}"
+        if self.tta:
+            signature += f",tta={self.tta_band}"
+        if self.cascade_thresholds:
+            signature += f",cascade={self.cascade_thresholds.get('healthy')}/{self.cascade_thresholds.get('diseased')}"
+        return signature
     
     def analyze_image(self, image_path):
         try:
-            img = Image.open(image_path)
-            img = img.convert('RGB')
+            with STAGE_SECONDS.time('decode'):
+                img = self._open_image(image_path)
             
-            if self.model_loaded and self.model is not None:
-                disease, confidence, severity = self._ml_predict(img)
-            else:
-                color_analysis = self._analyze_colors(img)
-                spot_analysis = self._detect_spots(img)
-                texture_analysis = self._analyze_texture(img)
-                disease, confidence, severity = self._determine_disease(
-                    color_analysis, spot_analysis, texture_analysis
-                )
-            
-            color_analysis = self._analyze_colors(img)
-            spot_analysis = self._detect_spots(img)
+            with STAGE_SECONDS.time('colour_analysis'):
+                features, green_mask = self._extract_features_and_mask(img)
             
-            disease_info = self.DISEASE_DATABASE.get(disease, self.DISEASE_DATABASE['healthy'])
+            model_input = None
+            if self._model_available() and not self._cascade_accepts(features):
+                try:
+                    model_input = self._prepare_model_input(img, green_mask)
+                except Exception as e:
+                    logger.error(f"ML prediction failed: {e}, falling back to rule-based")
             
-            return {
-                'disease': disease,
-                'disease_name': disease_info['name'],
-                'confidence': confidence,
-                'severity': severity,
-                'description': disease_info['description'],
-                'treatment': disease_info['treatment'],
-                'prevention': disease_info['prevention'],
-                'analysis_details': {
-                    'green_content': color_analysis['green_percentage'],
-                    'brown_content': color_analysis['brown_percentage'],
-                    'yellow_content': color_analysis['yellow_percentage'],
-                    'spots_detected': spot_analysis['spot_count'],
-                    'overall_health': color_analysis['health_score'],
-                    'ml_powered': self.model_loaded
-                }
-            }
+            return self._score_batch([(features, model_input)])[0]
         except Exception as e:
+            ANALYSIS_ERRORS.inc()
             logger.error(f"Image analysis failed: {e}")
             raise Exception(f"Image analysis failed: {str(e)}")
     
-    def _preprocess_for_leaves(self, img):
+    def analyze_batch(self, images, batch_size=32, max_workers=None, return_exceptions=False):
+        """
+        Analyze many images with one model forward pass per batch.
+        `images` may mix file paths and PIL images. Decoding and preprocessing run
+        on a thread pool while the previous batch is being scored. Returns one
+        result dict per input, in input order, shaped like analyze_image's.
+        With return_exceptions=True a failed image yields its exception instead
+        of aborting the whole batch.
+        """
+        return list(self.iter_batch(images, batch_size, max_workers, return_exceptions))
+    
+    def iter_batch(self, images, batch_size=32, max_workers=None, return_exceptions=False):
+        """
+        Generator form of analyze_batch. `images` may be any iterable and is
+        consumed lazily, at most two batches ahead of the model, so arbitrarily
+        long streams run in bounded memory. Results are yielded in input order
+        as each batch is scored.
+        """
+        images = iter(images)
+        use_model = self._model_available()
+        
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            pending = deque()
+            exhausted = False
+            
+            while not exhausted or pending:
+                # Keep up to two batches decoding ahead of the model
+                while not exhausted and len(pending) < 2 * batch_size:
+                    try:
+                        source = next(images)
+                    except StopIteration:
+                        exhausted = True
+                        break
+                    pending.append(pool.submit(self._prepare_image, source, use_model))
+                
+                batch = []
+                for _ in range(min(batch_size, len(pending))):
+                    try:
+                        batch.append(pending.popleft().result())
+                    except Exception as e:
+                        ANALYSIS_ERRORS.inc()
+                        logger.error(f"Image analysis failed: {e}")
+                        error = Exception(f"Image analysis failed: {str(e)}")
+                        if not return_exceptions:
+                            for future in pending:
+                                future.cancel()
+                            raise error
+                        batch.append(error)
+                
+                yield from self._score_batch(batch)
+    
+    def _open_image(self, source, max_side=None):
+        """
+        Decode a file path, file object or PIL image into an RGB image whose
+        longest edge is at most max_side (default: working_resolution).
+        JPEGs use draft mode, so libjpeg's DCT scaling decodes large photos
+        straight to 1/2, 1/4 or 1/8 size instead of materialising every pixel.
+        The coarsest scale that keeps at least DRAFT_MIN_SCALE * max_side is
+        chosen, so common camera sizes need little or no resize afterwards.
+        The EXIF orientation is applied, so features, tiles and heatmaps share
+        the orientation the browser and thumbnails display.
+        """
+        max_side = max_side or self.working_resolution
+        
+        if isinstance(source, Image.Image):
+            img = source
+        else:
+            img = Image.open(source)
+            if max_side and img.format == 'JPEG' and max(img.size) > max_side:
+                scale = max_side * self.DRAFT_MIN_SCALE / max(img.size)
+                img.draft('RGB', (max(1, int(img.width * scale)), max(1, int(img.height * scale))))
+        
+        img.load()
+        if img.getexif().get(0x0112, 1) != 1:
+            # Camera orientation tag; draft scaling is symmetric, so it can run first
+            img = ImageOps.exif_transpose(img)
+        if img.mode != 'RGB':
+            img = img.convert('RGB')
+        if max_side and max(img.size) > max_side:
+            scale = max_side / max(img.size)
+            size = (max(1, round(img.width * scale)), max(1, round(img.height * scale)))
+            img = img.resize(size, Image.Resampling.BILINEAR, reducing_gap=1.0)
+        return img
+    
+    def _prepare_image(self, source, use_model):
+        """Decode one image and compute everything needed before the forward pass."""
+        with STAGE_SECONDS.time('decode'):
+            img = self._open_image(source)
+        with STAGE_SECONDS.time('colour_analysis'):
+            features, green_mask = self._extract_features_and_mask(img)
+        model_input = None
+        if use_model and not self._cascade_accepts(features):
+            # Same fallback as analyze_image: the rule-based verdict still stands
+            try:
+                model_input = self._prepare_model_input(img, green_mask)
+            except Exception as e:
+                logger.error(f"ML prediction failed: {e}, falling back to rule-based")
+        return features, model_input
+    
+    def _load_cascade_thresholds(self, path):
+        """Per-verdict rule confidence thresholds from tune_cascade.py; None disables the cascade."""
+        path = path or self.CASCADE_THRESHOLDS_PATH
+        try:
+            with open(path) as f:
+                tuned = json.load(f)
+            thresholds = tuned['thresholds']
+            self._cascade_fingerprint = tuned.get('model_fingerprint')
+            logger.info(f"Cascade enabled with thresholds {thresholds} from {path}")
+            return thresholds
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Cascade thresholds unavailable ({e}), every image goes to the model")
+            return None
+    
+    def _check_cascade_fingerprint(self):
+        """Disable the cascade if its thresholds were tuned against a different model file."""
+        if self.cascade_thresholds and self._cascade_fingerprint != self.model_fingerprint:
+            logger.warning(f"Cascade thresholds were tuned for model {str(self._cascade_fingerprint)[:12]}, "
+                           f"not the loaded {self.model_fingerprint[:12]}; cascade disabled, "
+                           f"re-run tune_cascade.py")
+            self.cascade_thresholds = None
+    
+    def _cascade_accepts(self, features):
+        """Whether the rule-based verdict is confident enough to skip the model."""
+        if not self.cascade_thresholds:
+            return False
+        disease, confidence, _ = self._determine_disease(*features)
+        threshold = self.cascade_thresholds.get(disease)
+        return threshold is not None and confidence >= threshold
+    
+    def path_counts(self):
+        """Results produced by each analysis path since start-up."""
+        with self._path_lock:
+            return dict(self._path_counts)
+    
+    def record_paths(self, paths):
+        """Add {path: count} to path_counts (also used for results produced by pool workers)."""
+        with self._path_lock:
+            for path, count in paths.items():
+                self._path_counts[path] += count
+    
+    def _score_batch(self, batch):
+        """
+        Turn prepared (features, model_input) pairs into result dicts with one
+        forward pass. Items without a model input (model unavailable, or
+        accepted by the cascade) use the rule-based verdict.
+        """
+        prepared = [item for item in batch if not isinstance(item, Exception) and item[1] is not None]
+        predictions = None
+        
+        if prepared:
+            try:
+                with STAGE_SECONDS.time('predict'):
+                    predictions = iter(self._predict_prepared([model_input for _, model_input in prepared]))
+            except Exception as e:
+                logger.error(f"ML prediction failed: {e}, falling back to rule-based")
+        
+        results = []
+        paths = {'model': 0, 'cascade': 0, 'rules': 0}
+        for item in batch:
+            if isinstance(item, Exception):
+                results.append(item)
+                continue
+            
+            features, model_input = item
+            details = None
+            if model_input is not None and predictions is not None:
+                path = 'model'
+                score, details = next(predictions)
+                disease, confidence, severity = self._classify_score(score)
+                details = dict(details, model_score=round(float(score), 4), model_version=self.model_version)
+            else:
+                disease, confidence, severity = self._determine_disease(*features)
+                path = 'cascade' if model_input is None and self.model_loaded and self._cascade_accepts(features) else 'rules'
+            
+            paths[path] += 1
+            details = dict(details or {}, analysis_path=path)
+            results.append(self._build_result(disease, confidence, severity, features, path == 'model', details))
+        
+        self.record_paths(paths)
+        return results
+    
+    def _build_result(self, disease, confidence, severity, features, ml_powered, details=None):
+        color_analysis, spot_analysis, _ = features
+        disease_info = self.DISEASE_DATABASE.get(disease, self.DISEASE_DATABASE['healthy'])
+        
+        result = {
+            'disease': disease,
+            'disease_name': disease_info['name'],
+            'confidence': confidence,
+            'severity': severity,
+            'description': disease_info['description'],
+            'treatment': disease_info['treatment'],
+            'prevention': disease_info['prevention'],
+            'analysis_details': {
+                'green_content': color_analysis['green_percentage'],
+                'brown_content': color_analysis['brown_percentage'],
+                'yellow_content': color_analysis['yellow_percentage'],
+                'spots_detected': spot_analysis['spot_count'],
+                'overall_health': color_analysis['health_score'],
+                'ml_powered': ml_powered
+            }
+        }
+        if details:
+            result['analysis_details'].update(details)
+        return result
+    
+    def _preprocess_for_leaves(self, img, green_mask=None):
         """
         Preprocess image to focus on leaf regions.
         Handles both close-up leaves and full plant images.
+        green_mask is the leaf mask already computed by _extract_features; it
+        may come from a pixel-budget sample, so it need not match img's size.
         """
         from PIL import ImageEnhance
         
-        # Convert to numpy array
-        img_array = np.array(img)
         original_img = img  # Keep original for fallback
         
         # Check if this is a full plant image (lots of background)
-        if len(img_array.shape) == 3:
-            r = img_array[:, :, 0]
-            g = img_array[:, :, 1]
-            b = img_array[:, :, 2]
-            
-            # Identify green pixels (leaves)
-            green_mask = (g > r) & (g > b) & (g > 50)
-            green_percentage = (np.sum(green_mask) / green_mask.size) * 100
+        if green_mask is None:
+            green_mask = self._green_mask(img)
+        green_percentage = (np.count_nonzero(green_mask) / green_mask.size) * 100
+        
+        # If less than 70% green, this is likely a full plant photo
+        # Focus on the green regions
+        if green_percentage < 70 and green_percentage > 10:  # Added lower bound check
+            logger.info(f"Full plant image detected ({green_percentage:.1f}% green). Focusing on leaves...")
             
-            # If less than 70% green, this is likely a full plant photo
-            # Focus on the green regions
-            if green_percentage < 70 and green_percentage > 10:  # Added lower bound check
-                logger.info(f"Full plant image detected ({green_percentage:.1f}% green). Focusing on leaves...")
+            # Find bounding box of green regions
+            bbox = self._leaf_bbox(green_mask, img.size)
+            if bbox is not None:
+                x_min, y_min, x_max, y_max = bbox
                 
-                # Find bounding box of green regions
-                coords = np.argwhere(green_mask)
-                if len(coords) > 0:
-                    y_min, x_min = coords.min(axis=0)
-                    y_max, x_max = coords.max(axis=0)
-                    
-                    # Add some padding (10%)
-                    height, width = green_mask.shape
-                    padding_y = int((y_max - y_min) * 0.1)
-                    padding_x = int((x_max - x_min) * 0.1)
-                    
-                    y_min = max(0, y_min - padding_y)
-                    y_max = min(height, y_max + padding_y)
-                    x_min = max(0, x_min - padding_x)
-                    x_max = min(width, x_max + padding_x)
-                    
-                    # Calculate crop area percentage
-                    crop_area = (x_max - x_min) * (y_max - y_min)
-                    total_area = width * height
-                    crop_percentage = (crop_area / total_area) * 100
-                    
-                    # Safety check: only crop if it's meaningful (not just the whole image)
-                    if crop_percentage < 80:
-                        img = img.crop((x_min, y_min, x_max, y_max))
-                        logger.info(f"Cropped to leaf region: {x_max-x_min}x{y_max-y_min} ({crop_percentage:.1f}% of image)")
-                    else:
-                        logger.info(f"Crop area too large ({crop_percentage:.1f}%), using original image")
-                        img = original_img
-            elif green_percentage <= 10:
-                logger.info(f"Very low green content ({green_percentage:.1f}%), using original image")
-                img = original_img
-            else:
-                logger.info(f"Close-up leaf image detected ({green_percentage:.1f}% green)")
+                # Add some padding (10%)
+                width, height = img.size
+                padding_y = int((y_max - y_min) * 0.1)
+                padding_x = int((x_max - x_min) * 0.1)
+                
+                y_min = max(0, y_min - padding_y)
+                y_max = min(height, y_max + padding_y)
+                x_min = max(0, x_min - padding_x)
+                x_max = min(width, x_max + padding_x)
+                
+                # Calculate crop area percentage
+                crop_area = (x_max - x_min) * (y_max - y_min)
+                total_area = width * height
+                crop_percentage = (crop_area / total_area) * 100
+                
+                # Safety check: only crop if it's meaningful (not just the whole image)
+                if crop_percentage < 80:
+                    img = img.crop((x_min, y_min, x_max, y_max))
+                    logger.info(f"Cropped to leaf region: {x_max-x_min}x{y_max-y_min} ({crop_percentage:.1f}% of image)")
+                else:
+                    logger.info(f"Crop area too large ({crop_percentage:.1f}%), using original image")
+                    img = original_img
+        elif green_percentage <= 10:
+            logger.info(f"Very low green content ({green_percentage:.1f}%), using original image")
+            img = original_img
+        else:
+            logger.info(f"Close-up leaf image detected ({green_percentage:.1f}% green)")
         
         # Enhance contrast to make disease signs more visible
         enhancer = ImageEnhance.Contrast(img)
@@ -150,98 +636,344 @@ class DiseaseAnalyzer:
         
         return img
     
-    def _ml_predict(self, img):
-        try:
-            import tensorflow as tf
-            
-            # Preprocess to focus on leaves
-            img_processed = self._preprocess_for_leaves(img)
-            
-            # Resize for model input
-            img_resized = img_processed.resize((224, 224))
-            img_array = np.array(img_resized) / 255.0
-            img_array = np.expand_dims(img_array, axis=0)
-            
-            prediction = self.model.predict(img_array, verbose=0)[0][0]
+    def _leaf_bbox(self, green_mask, size):
+        """
+        Bounding box (x_min, y_min, x_max, y_max) of the green pixels, scaled to
+        an image of the given (width, height), or None if there are none.
+        Uses row/column projections of a strided view of the mask, which
+        allocates two small boolean vectors instead of an (N, 2) coordinate
+        array. Isolated green pixels on skipped rows or columns can be missed,
+        which only trims stray specks from the box; the 10% crop padding
+        absorbs the difference.
+        """
+        mask_h, mask_w = green_mask.shape
+        stride = max(1, math.ceil(max(mask_h, mask_w) / self.ROI_MASK_SIDE))
+        view = green_mask[::stride, ::stride]
+        
+        rows = view.any(axis=1)
+        if not rows.any():
+            return None
+        cols = view.any(axis=0)
+        
+        top = int(rows.argmax())
+        bottom = len(rows) - int(rows[::-1].argmax())
+        left = int(cols.argmax())
+        right = len(cols) - int(cols[::-1].argmax())
+        
+        # Strided view -> mask -> image coordinates, with exclusive ends
+        width, height = size
+        scale_x = width / mask_w
+        scale_y = height / mask_h
+        return (
+            int(left * stride * scale_x),
+            int(top * stride * scale_y),
+            min(width, math.ceil(min(mask_w, (right - 1) * stride + 1) * scale_x)),
+            min(height, math.ceil(min(mask_h, (bottom - 1) * stride + 1) * scale_y)),
+        )
+    
+    def _prepare_model_input(self, img, green_mask=None):
+        """
+        Leaf crop, resize and scale one image into a (224, 224, 3) float32 array.
+        In tiled mode this returns LeafTiles instead, unless the image is too
+        small to tile or has no leafy tile.
+        """
+        if self.tiled:
+            if green_mask is None:
+                green_mask = self._green_mask(img)
+            with STAGE_SECONDS.time('tiling'):
+                tiles = self._prepare_tiles(img, green_mask)
+            if tiles is not None:
+                return tiles
+        
+        # Preprocess to focus on leaves
+        with STAGE_SECONDS.time('leaf_crop'):
+            img_processed = self._preprocess_for_leaves(img, green_mask)
+        
+        # Resize for model input
+        with STAGE_SECONDS.time('resize'):
+            img_resized = img_processed.resize((self.MODEL_INPUT_SIZE, self.MODEL_INPUT_SIZE))
+            model_input = np.asarray(img_resized, dtype=np.float32) / 255.0
+        return model_input
+    
+    def _prepare_tiles(self, img, green_mask):
+        """
+        Cut img into overlapping model-sized tiles and keep those with enough
+        leaf pixels, most leafy first, up to tile_budget. Leaf fractions come
+        from an integral image of the shared green mask, so each tile costs
+        four lookups however large it is.
+        """
+        from PIL import ImageEnhance
+        
+        size = self.MODEL_INPUT_SIZE
+        width, height = img.size
+        if width < size or height < size:
+            return None
+        
+        step = max(1, int(size * (1 - self.tile_overlap)))
+        xs = self._tile_starts(width, size, step)
+        ys = self._tile_starts(height, size, step)
+        
+        # The mask may come from a pixel-budget sample; map tile edges onto it
+        mask_h, mask_w = green_mask.shape
+        integral = np.zeros((mask_h + 1, mask_w + 1), dtype=np.int64)
+        integral[1:, 1:] = green_mask.cumsum(axis=0).cumsum(axis=1)
+        
+        candidates = []
+        for y in ys:
+            y0 = y * mask_h // height
+            y1 = max(y0 + 1, (y + size) * mask_h // height)
+            for x in xs:
+                x0 = x * mask_w // width
+                x1 = max(x0 + 1, (x + size) * mask_w // width)
+                leaf = integral[y1, x1] - integral[y0, x1] - integral[y1, x0] + integral[y0, x0]
+                fraction = leaf / ((y1 - y0) * (x1 - x0))
+                if fraction >= self.TILE_MIN_LEAF:
+                    candidates.append((fraction, x, y))
+        
+        if not candidates:
+            return None
+        
+        candidates.sort(key=lambda candidate: -candidate[0])
+        kept = candidates[:self.tile_budget]
+        
+        # Same contrast boost as the whole-image path, applied once before slicing
+        pixels = np.asarray(ImageEnhance.Contrast(img).enhance(1.2))
+        tiles = np.stack([pixels[y:y + size, x:x + size] for _, x, y in kept]).astype(np.float32) / 255.0
+        return LeafTiles(tiles, [(x, y) for _, x, y in kept], img.size, len(xs) * len(ys))
+    
+    @staticmethod
+    def _tile_starts(length, size, step):
+        """Tile offsets along one axis; the last tile is aligned to the far edge."""
+        starts = list(range(0, length - size + 1, step))
+        if starts[-1] != length - size:
+            starts.append(length - size)
+        return starts
+    
+    def _predict_prepared(self, inputs):
+        """
+        Score prepared model inputs. Plain (224, 224, 3) arrays share one
+        stacked forward pass (plus one TTA pass for uncertain ones); each
+        LeafTiles is scored in tile_batch_size chunks. Returns a
+        (score, extra analysis_details) pair per input.
+        """
+        outputs = [None] * len(inputs)
+        
+        whole = [i for i, model_input in enumerate(inputs) if not isinstance(model_input, LeafTiles)]
+        if whole:
+            batch = np.stack([inputs[i] for i in whole])
+            scores = self._predict_scores(batch)
+            details = [{} for _ in whole]
+            if self.tta:
+                scores = self._apply_tta(batch, scores, details)
+            for i, score, extra in zip(whole, scores, details):
+                outputs[i] = (score, extra)
+        
+        for i, model_input in enumerate(inputs):
+            if isinstance(model_input, LeafTiles):
+                outputs[i] = self._score_tiles(model_input)
+        
+        return outputs
+    
+    def _apply_tta(self, batch, scores, details):
+        """
+        Test-time augmentation for borderline predictions only: inputs whose
+        first-pass score is within tta_band of 0.5 are re-scored as flips and
+        90-degree rotations, all in one extra forward pass, and their score is
+        replaced by the mean over every view. Confident inputs cost nothing extra.
+        """
+        uncertain = np.flatnonzero(np.abs(scores - 0.5) < self.tta_band)
+        if len(uncertain) == 0:
+            return scores
+        
+        views = np.concatenate([self._augmented_views(batch[i]) for i in uncertain])
+        augmented = np.asarray(self._predict_scores(views)).reshape(len(uncertain), -1)
+        
+        scores = np.array(scores, dtype=np.float64)
+        for row, i in enumerate(uncertain):
+            view_scores = np.concatenate([[scores[i]], augmented[row]])
+            details[i].update({
+                'tta_views': len(view_scores),
+                'tta_first_pass': round(float(scores[i]), 4),
+                'tta_score': round(float(view_scores.mean()), 4),
+                'tta_spread': round(float(view_scores.std()), 4)
+            })
+            scores[i] = view_scores.mean()
+        return scores
+    
+    @staticmethod
+    def _augmented_views(image):
+        """Horizontal and vertical flips plus 90, 180 and 270 degree rotations of one (H, W, 3) input."""
+        return np.stack([
+            image[:, ::-1],
+            image[::-1],
+            np.rot90(image, 1),
+            np.rot90(image, 2),
+            np.rot90(image, 3)
+        ])
+    
+    def _score_tiles(self, leaf_tiles):
+        """Classify leaf tiles in bounded batches and aggregate them into one score plus heatmap data."""
+        tiles = leaf_tiles.tiles
+        scores = np.concatenate([
+            self._predict_scores(tiles[start:start + self.tile_batch_size])
+            for start in range(0, len(tiles), self.tile_batch_size)
+        ])
+        
+        # Lesions are local: average the least healthy quarter of tiles so a few
+        # diseased tiles are not outvoted by the healthy rest of the plant
+        worst = np.sort(scores)[:max(1, len(scores) // 4)]
+        score = float(worst.mean())
+        
+        details = {
+            'tiles_analyzed': len(scores),
+            'tiles_skipped': leaf_tiles.candidates - len(scores),
+            'diseased_tiles': int(np.count_nonzero(scores <= 0.5)),
+            'tile_heatmap': {
+                'size': list(leaf_tiles.image_size),
+                'tile': self.MODEL_INPUT_SIZE,
+                'tiles': [[x, y, round(float(s), 4)] for (x, y), s in zip(leaf_tiles.positions, scores)]
+            }
+        }
+        return score, details
+    
+    @staticmethod
+    def render_heatmap(heatmap, cell=8):
+        """
+        RGBA overlay for a result's tile_heatmap at 1/cell of the analysed size:
+        red where tiles look diseased, green where healthy, transparent where
+        no tile was classified. Overlapping tiles are averaged.
+        """
+        width, height = heatmap['size']
+        size = heatmap['tile']
+        total = np.zeros((math.ceil(height / cell), math.ceil(width / cell)))
+        count = np.zeros_like(total)
+        
+        for x, y, score in heatmap['tiles']:
+            region = (slice(y // cell, (y + size) // cell), slice(x // cell, (x + size) // cell))
+            total[region] += score
+            count[region] += 1
+        
+        mean = np.divide(total, count, out=np.zeros_like(total), where=count > 0)
+        rgba = np.zeros(total.shape + (4,), dtype=np.uint8)
+        rgba[..., 0] = ((1 - mean) * 255).astype(np.uint8)
+        rgba[..., 1] = (mean * 255).astype(np.uint8)
+        rgba[..., 3] = np.where(count > 0, 150, 0)
+        return Image.fromarray(rgba, 'RGBA')
+    
+    def _predict_scores(self, batch):
+        """Run the model on a (N, 224, 224, 3) batch and return N healthy-probability scores."""
+        if self.backend == 'tflite':
+            return self._tflite_predict(batch)
+        if self._infer is not None:
+            return np.asarray(self._infer(batch))[:, 0]
+        return self.model.predict(batch, batch_size=len(batch), verbose=0)[:, 0]
+    
+    def _classify_score(self, prediction):
+        # Model trained with flow_from_directory: diseased=0, healthy=1
+        # prediction close to 1 = healthy, close to 0 = diseased
+        if prediction > 0.5:
+            disease = 'healthy'
+            confidence = float(prediction * 100)
+            severity = 'None'
+        else:
+            disease = 'diseased'
+            confidence = float((1 - prediction) * 100)
             
-            # Model trained with flow_from_directory: diseased=0, healthy=1
-            # prediction close to 1 = healthy, close to 0 = diseased
-            if prediction > 0.5:
-                disease = 'healthy'
-                confidence = float(prediction * 100)
-                severity = 'None'
+            if prediction < 0.2:
+                severity = 'High'
+            elif prediction < 0.35:
+                severity = 'Medium'
             else:
-                disease = 'diseased'
-                confidence = float((1 - prediction) * 100)
-                
-                if prediction < 0.2:
-                    severity = 'High'
-                elif prediction < 0.35:
-                    severity = 'Medium'
-                else:
-                    severity = 'Low'
-            
-            return disease, confidence, severity
-            
-        except Exception as e:
-            logger.error(f"ML prediction failed: {e}, falling back to rule-based")
-            color_analysis = self._analyze_colors(img)
-            spot_analysis = self._detect_spots(img)
-            texture_analysis = self._analyze_texture(img)
-            return self._determine_disease(color_analysis, spot_analysis, texture_analysis)
+                severity = 'Low'
+        
+        return disease, confidence, severity
     
-    def _analyze_colors(self, img):
-        pixels = np.array(img)
-        height, width, _ = pixels.shape
-        total_pixels = height * width
+    def _extract_features(self, img):
+        """
+        Fused colour, spot and texture analysis.
+        Reads the RGB buffer once and returns (color_analysis, spot_analysis, texture_analysis).
+        With a pixel_budget the statistics are estimated from an evenly strided sample.
+        """
+        return self._extract_features_and_mask(img)[0]
+    
+    def _extract_features_and_mask(self, img):
+        """_extract_features plus the green mask, for reuse by the leaf crop."""
+        img = self._sample_for_budget(img)
         
-        r = pixels[:, :, 0].flatten()
-        g = pixels[:, :, 1].flatten()
-        b = pixels[:, :, 2].flatten()
+        # Split into contiguous uint8 planes in C; strided channel views of the
+        # interleaved buffer make every comparison below several times slower
+        r, g, b = (np.asarray(band) for band in img.split())
+        total_pixels = r.size
         
         green_mask = (g > r) & (g > b) & (g > 50)
-        green_pixels = np.sum(green_mask)
-        green_percentage = (green_pixels / total_pixels) * 100
+        green_percentage = (np.count_nonzero(green_mask) / total_pixels) * 100
         
-        brown_mask = ((r > 80) & (r < 220) & (g > 40) & (g < 180) & (b < 120) & (r > b))
-        brown_pixels = np.sum(brown_mask)
-        brown_percentage = (brown_pixels / total_pixels) * 100
+        # Brown and yellow share the "warm, low blue" condition
+        warm = (b < 120) & (r > b)
+        brown_mask = warm & (r > 80) & (r < 220) & (g > 40) & (g < 180)
+        brown_percentage = (np.count_nonzero(brown_mask) / total_pixels) * 100
         
-        yellow_mask = ((r > 120) & (g > 120) & (b < 120) & (r > b) & (g > b))
-        yellow_pixels = np.sum(yellow_mask)
-        yellow_percentage = (yellow_pixels / total_pixels) * 100
+        yellow_mask = warm & (r > 120) & (g > 120) & (g > b)
+        yellow_percentage = (np.count_nonzero(yellow_mask) / total_pixels) * 100
         
         health_score = green_percentage - (brown_percentage + yellow_percentage * 0.7)
         
-        return {
+        # Spot threshold and texture variance both come from one grayscale histogram
+        hist = np.array(img.convert('L').histogram(), dtype=np.float64)
+        levels = np.arange(256, dtype=np.float64)
+        count = hist.sum()
+        total = (hist * levels).sum()
+        mean = total / count
+        variance = ((hist * levels * levels).sum() - total * total / count) / count
+        variance = max(variance, 0.0)
+        
+        threshold = mean - (np.sqrt(variance) * 0.8)
+        darker_levels = min(256, max(0, int(np.ceil(threshold))))
+        spot_count = hist[:darker_levels].sum() / count * 100
+        
+        color_analysis = {
             'green_percentage': round(green_percentage, 2),
             'brown_percentage': round(brown_percentage, 2),
             'yellow_percentage': round(yellow_percentage, 2),
             'health_score': round(health_score, 2)
         }
-    
-    def _detect_spots(self, img):
-        img_gray = img.convert('L')
-        pixels = np.array(img_gray)
-        
-        threshold = np.mean(pixels) - (np.std(pixels) * 0.8)
-        dark_spots = pixels < threshold
-        
-        spot_count = np.sum(dark_spots) / pixels.size * 100
-        
-        return {
+        spot_analysis = {
             'spot_count': round(spot_count, 2),
             'has_significant_spots': spot_count > 8
         }
-    
-    def _analyze_texture(self, img):
-        stat = ImageStat.Stat(img.convert('L'))
-        variance = stat.var[0]
-        
-        return {
+        texture_analysis = {
             'texture_variance': variance,
             'is_uniform': variance < 500
         }
+        return (color_analysis, spot_analysis, texture_analysis), green_mask
+    
+    def _green_mask(self, img):
+        """Boolean mask of leaf-green pixels."""
+        r, g, b = (np.asarray(band) for band in img.split())
+        return (g > r) & (g > b) & (g > 50)
+    
+    def _sample_for_budget(self, img):
+        """
+        Approximate mode: keep every s-th pixel in both directions so at most
+        pixel_budget pixels are analysed. Nearest-neighbour resampling is an
+        exact strided view, so percentages stay unbiased; area averaging would
+        blend small lesions into their surroundings and shift the colour masks.
+        """
+        if not self.pixel_budget or img.width * img.height <= self.pixel_budget:
+            return img
+        
+        stride = math.ceil(math.sqrt(img.width * img.height / self.pixel_budget))
+        size = (max(1, img.width // stride), max(1, img.height // stride))
+        return img.resize(size, Image.Resampling.NEAREST)
+    
+    def _analyze_colors(self, img):
+        return self._extract_features(img)[0]
+    
+    def _detect_spots(self, img):
+        return self._extract_features(img)[1]
+    
+    def _analyze_texture(self, img):
+        return self._extract_features(img)[2]
     
     def _determine_disease(self, color_analysis, spot_analysis, texture_analysis):
         health_score = color_analysis['health_score']
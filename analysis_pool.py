@@ -0,0 +1,149 @@
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import numpy as np
+from PIL import Image
+from analysis import ANALYSIS_ERRORS, STAGE_SECONDS, DiseaseAnalyzer
+
+logger = logging.getLogger(__name__)
+
+# One warm analyzer per worker process, created by _init_worker
+_worker_analyzer = None
+
+
+def _init_worker(analyzer_kwargs):
+    global _worker_analyzer
+    _worker_analyzer = DiseaseAnalyzer(**analyzer_kwargs)
+    logger.info(f"Analysis worker {os.getpid()} ready (model {_worker_analyzer.model_state})")
+
+
+def _model_report():
+    return _worker_analyzer.worker_model_report()
+
+
+def _analyze_shared(name, shape):
+    """Analyze an RGB image that the parent placed in the named shared-memory block."""
+    block = shared_memory.SharedMemory(name=name)
+    try:
+        pixels = np.ndarray(shape, dtype=np.uint8, buffer=block.buf)
+        img = Image.fromarray(pixels, 'RGB')
+        # The view must go before close(), which refuses while buffers are exported
+        del pixels
+        return _worker_analyzer.analyze_image(img)
+    finally:
+        block.close()
+
+
+class AnalysisPool:
+    """
+    Runs analyze_image in worker processes so the NumPy/Pillow-bound feature
+    extraction is not serialised by the GIL across request threads.
+
+    The calling thread decodes the upload (with the parent analyzer's
+    working resolution) and copies the RGB pixels into a shared-memory block;
+    only the block name and shape are pickled to the worker. Each worker
+    builds its own DiseaseAnalyzer from analyzer_kwargs at start-up, so a
+    configured model is loaded once per process. The parent analyzer is only
+    used for decoding; build it with load_model=False so it does not hold a
+    copy of the model as well. Its model state and fingerprint are then taken
+    from what the workers report once they have started, and the analysis
+    paths of worker results are counted on it.
+    """
+
+    def __init__(self, analyzer, max_workers=None, analyzer_kwargs=None):
+        self.analyzer = analyzer
+        self.max_workers = max_workers or os.cpu_count() or 1
+
+        kwargs = dict(analyzer_kwargs or {})
+        # Workers load synchronously so they are warm before taking work
+        kwargs['load_in_background'] = False
+
+        # spawn rather than fork: the parent may hold TensorFlow and server threads
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.max_workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_worker,
+            initargs=(kwargs,)
+        )
+
+        # A parent built with load_model=False takes its model state from the workers
+        self._delegated = analyzer.model_state == 'disabled'
+        if self._delegated:
+            analyzer.delegate_model()
+
+        # Each submit without an idle worker starts a process; start them all now
+        self._started = [self._executor.submit(_model_report) for _ in range(self.max_workers)]
+        self._pending_reports = len(self._started)
+        self._reports_lock = threading.Lock()
+        for future in self._started:
+            future.add_done_callback(self._collect_report)
+
+    def _collect_report(self, _):
+        """Once every start-up task has finished, hand the workers' model reports to a delegating parent."""
+        with self._reports_lock:
+            self._pending_reports -= 1
+            if self._pending_reports:
+                return
+        if not self._delegated:
+            return
+        reports = []
+        for future in self._started:
+            error = future.exception()
+            if error is not None:
+                logger.error(f"Analysis worker failed to start: {error}")
+                reports.append({'state': 'failed', 'fingerprint': None, 'signature': None})
+            else:
+                reports.append(future.result())
+        self.analyzer.adopt_worker_models(reports)
+
+    def wait_until_ready(self, timeout=None):
+        """Block until the start-up tasks have run, i.e. workers are launched and serving."""
+        for future in self._started:
+            future.result(timeout)
+
+    def analyze_image(self, image_path, timeout=None):
+        """Drop-in replacement for DiseaseAnalyzer.analyze_image."""
+        return self.submit(image_path).result(timeout)
+
+    def submit(self, source):
+        """Decode one image into shared memory and queue it; the future resolves to its result dict."""
+        try:
+            with STAGE_SECONDS.time('decode'):
+                pixels = np.asarray(self.analyzer._open_image(source))
+        except Exception as e:
+            ANALYSIS_ERRORS.inc()
+            logger.error(f"Image analysis failed: {e}")
+            raise Exception(f"Image analysis failed: {str(e)}")
+
+        block = shared_memory.SharedMemory(create=True, size=max(1, pixels.nbytes))
+        try:
+            np.ndarray(pixels.shape, dtype=np.uint8, buffer=block.buf)[...] = pixels
+            future = self._executor.submit(_analyze_shared, block.name, pixels.shape)
+        except Exception:
+            self._release(block)
+            raise
+
+        future.add_done_callback(lambda _: self._release(block))
+        future.add_done_callback(self._count_path)
+        return future
+
+    def _count_path(self, future):
+        if future.cancelled() or future.exception() is not None:
+            return
+        path = future.result()['analysis_details'].get('analysis_path')
+        if path:
+            self.analyzer.record_paths({path: 1})
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+
+    @staticmethod
+    def _release(block):
+        block.close()
+        try:
+            block.unlink()
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+Analyze every image under a directory and stream the results to JSONL or CSV.
+
+Images are discovered lazily, decoded on a thread pool ahead of the model,
+and scored in batches through DiseaseAnalyzer.iter_batch. One output row is
+written per image and flushed after every batch, so the output file doubles
+as the checkpoint: re-running the same command skips every image already in
+it. A row cut short by an interruption is dropped and redone; images that
+failed to decode are recorded with their error and not retried.
+
+Usage: python analyze_dir.py DIRECTORY -o results.jsonl [--format jsonl|csv]
+                             [--batch-size 32] [--workers N] [--overwrite]
+"""
+import argparse
+import csv
+import json
+import logging
+import os
+import sys
+import time
+from collections import deque
+from analysis import DiseaseAnalyzer
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.gif', '.bmp', '.webp')
+FIELDS = [
+    'path', 'disease', 'disease_name', 'confidence', 'severity',
+    'green_content', 'brown_content', 'yellow_content', 'spots_detected', 'overall_health',
+    'ml_powered', 'fingerprint', 'error',
+]
+
+
+def iter_images(directory):
+    """Image paths under directory, depth first in sorted order, without listing the whole tree up front."""
+    with os.scandir(directory) as entries:
+        entries = sorted(entries, key=lambda entry: entry.name)
+    for entry in entries:
+        if entry.is_dir(follow_symlinks=False):
+            yield from iter_images(entry.path)
+        elif entry.name.lower().endswith(IMAGE_EXTENSIONS):
+            yield entry.path
+
+
+def to_row(path, result, fingerprint):
+    row = {'path': path, 'fingerprint': fingerprint}
+    if isinstance(result, Exception):
+        row['error'] = str(result)
+        return row
+
+    details = result['analysis_details']
+    row.update({
+        'disease': result['disease'],
+        'disease_name': result['disease_name'],
+        'confidence': round(result['confidence'], 2),
+        'severity': result['severity'],
+        'green_content': details['green_content'],
+        'brown_content': details['brown_content'],
+        'yellow_content': details['yellow_content'],
+        'spots_detected': details['spots_detected'],
+        'overall_health': details['overall_health'],
+        'ml_powered': details['ml_powered'],
+    })
+    return row
+
+
+def load_checkpoint(output, fmt):
+    """
+    Paths and fingerprints already written to output. A trailing partial row
+    left by an interrupted run is truncated away so appending stays valid.
+    """
+    done = {}
+    if not os.path.exists(output):
+        return done
+
+    with open(output, 'rb') as f:
+        data = f.read()
+    complete = data[:data.rfind(b'\n') + 1]
+    if len(complete) != len(data):
+        with open(output, 'r+b') as f:
+            f.truncate(len(complete))
+
+    lines = complete.decode('utf-8').splitlines()
+    if fmt == 'csv':
+        rows = csv.DictReader(lines)
+    else:
+        rows = (json.loads(line) for line in lines if line.strip())
+    for row in rows:
+        done[row['path']] = row.get('fingerprint')
+    return done
+
+
+class Writer:
+    """Appends rows to a JSONL or CSV file, flushing to disk on checkpoint()."""
+
+    def __init__(self, output, fmt):
+        write_header = fmt == 'csv' and (not os.path.exists(output) or os.path.getsize(output) == 0)
+        self.file = open(output, 'a', newline='', encoding='utf-8')
+        self.csv = None
+        if fmt == 'csv':
+            self.csv = csv.DictWriter(self.file, fieldnames=FIELDS)
+            if write_header:
+                self.csv.writeheader()
+
+    def write(self, row):
+        if self.csv is not None:
+            self.csv.writerow(row)
+        else:
+            self.file.write(json.dumps(row) + '\n')
+
+    def checkpoint(self):
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def close(self):
+        self.checkpoint()
+        self.file.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Analyze a directory of plant images.')
+    parser.add_argument('directory')
+    parser.add_argument('-o', '--output', required=True, help='results file (.jsonl or .csv)')
+    parser.add_argument('--format', choices=['jsonl', 'csv'],
+                        help='output format (default: from the output file extension)')
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--workers', type=int, default=None, help='decode threads')
+    parser.add_argument('--overwrite', action='store_true', help='start over instead of resuming')
+    parser.add_argument('--working-resolution', type=int, default=DiseaseAnalyzer.WORKING_RESOLUTION,
+                        help='decode resolution (0 = full resolution)')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    fmt = args.format or ('csv' if args.output.lower().endswith('.csv') else 'jsonl')
+
+    if args.overwrite and os.path.exists(args.output):
+        os.remove(args.output)
+
+    analyzer = DiseaseAnalyzer(working_resolution=args.working_resolution or None)
+    fingerprint = analyzer.result_fingerprint()
+
+    done = load_checkpoint(args.output, fmt)
+    if done:
+        stale = sum(1 for value in done.values() if value != fingerprint)
+        print(f"Resuming: {len(done)} images already in {args.output}")
+        if stale:
+            print(f"Warning: {stale} of them were produced with a different model or settings "
+                  f"(use --overwrite to redo everything)")
+
+    skipped = 0
+
+    def todo():
+        nonlocal skipped
+        for path in iter_images(args.directory):
+            if path in done:
+                skipped += 1
+            else:
+                yield path
+
+    # iter_batch yields in input order, so paths can be paired with results as they arrive
+    paths = deque()
+
+    def tracked():
+        for path in todo():
+            paths.append(path)
+            yield path
+
+    writer = Writer(args.output, fmt)
+    start = time.perf_counter()
+    processed = 0
+    errors = 0
+    try:
+        results = analyzer.iter_batch(tracked(), batch_size=args.batch_size,
+                                      max_workers=args.workers, return_exceptions=True)
+        for result in results:
+            writer.write(to_row(paths.popleft(), result, fingerprint))
+            processed += 1
+            errors += isinstance(result, Exception)
+
+            if processed % args.batch_size == 0:
+                writer.checkpoint()
+                rate = processed / (time.perf_counter() - start)
+                print(f"  {processed} analyzed ({rate:.1f} img/s), {skipped} skipped", file=sys.stderr)
+    except KeyboardInterrupt:
+        print("Interrupted; re-run the same command to resume", file=sys.stderr)
+    finally:
+        writer.close()
+
+    elapsed = time.perf_counter() - start
+    rate = processed / elapsed if elapsed > 0 else 0.0
+    print(f"Done: {processed} analyzed ({errors} failed), {skipped} already done, "
+          f"{elapsed:.1f}s ({rate:.1f} img/s) -> {args.output}")
+
+
+if __name__ == '__main__':
+    main()
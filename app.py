@@ -1,12 +1,29 @@
 
 import os
 import logging
+import mimetypes
+import multiprocessing
+import re
+import time
+import uuid
+import zipfile
 from datetime import datetime
-from werkzeug.utils import secure_filename
-from flask import Flask, render_template, request, flash, redirect, url_for, session
-from models import db, User, Analysis
+from urllib.parse import quote
+from werkzeug.utils import secure_filename, safe_join
+from sqlalchemy import event
+from flask import Flask, render_template, request, flash, redirect, url_for, session, jsonify, abort
+from models import db, DATABASE_URL, User, Analysis, DiseaseInfo
 from email_validator import validate_email, EmailNotValidError
+import metrics
 from analysis import DiseaseAnalyzer
+from analysis_pool import AnalysisPool
+from batching import MicroBatcher
+from jobs import JobQueue
+from migrations import add_missing_columns, add_missing_indexes, move_disease_text
+from prediction_cache import PredictionCache, file_sha256
+from profiling import SamplingProfiler
+from storage import BlobStore
+from thumbnails import ThumbnailCache
 
 # Configure logging
 logging.basicConfig(level=logging.DEBUG)
@@ -19,7 +36,7 @@ if not app.secret_key:
     raise ValueError("SESSION_SECRET environment variable must be set")
 
 # Database configuration
-app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL', 'sqlite:///plant_disease.db')
+app.config['SQLALCHEMY_DATABASE_URI'] = DATABASE_URL
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 
 # Configuration
@@ -30,15 +47,290 @@ MAX_FILE_SIZE = 16 * 1024 * 1024  # 16MB
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 app.config['MAX_CONTENT_LENGTH'] = MAX_FILE_SIZE
 
+def env_flag(name, default=False):
+    """Read a boolean flag such as INFERENCE_BATCHING=1 from the environment."""
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ('1', 'true', 'yes', 'on')
+
+# Model inference: traced fixed-signature function (optionally XLA-compiled) instead of model.predict
+app.config['COMPILED_INFERENCE'] = env_flag('COMPILED_INFERENCE', True)
+app.config['XLA_JIT'] = env_flag('XLA_JIT')
+
+# Inference backend: 'keras' or 'tflite' (quantized models written by export_tflite.py)
+app.config['ANALYZER_BACKEND'] = os.environ.get('ANALYZER_BACKEND', 'keras')
+app.config['TFLITE_MODEL_PATH'] = os.environ.get('TFLITE_MODEL_PATH', DiseaseAnalyzer.TFLITE_MODEL_PATH)
+app.config['TFLITE_THREADS'] = int(os.environ.get('TFLITE_THREADS', 0)) or None
+
+# Load the model on a background thread so pages are served immediately after a (re)start.
+# Analyses arriving before it is ready wait up to MODEL_WAIT_TIMEOUT seconds, then use the rule-based path.
+app.config['MODEL_BACKGROUND_LOAD'] = env_flag('MODEL_BACKGROUND_LOAD', True)
+app.config['MODEL_WAIT_TIMEOUT'] = float(os.environ.get('MODEL_WAIT_TIMEOUT', 10))
+
+# Uploads are decoded straight to this longest edge (JPEG DCT scaling); 0 analyzes at full resolution
+app.config['WORKING_RESOLUTION'] = int(os.environ.get('WORKING_RESOLUTION', DiseaseAnalyzer.WORKING_RESOLUTION)) or None
+
+# Approximate rule-based features from at most this many sampled pixels; 0 analyzes every pixel
+app.config['ANALYSIS_PIXEL_BUDGET'] = int(os.environ.get('ANALYSIS_PIXEL_BUDGET', 0)) or None
+
+# Tiled mode: classify overlapping leaf tiles instead of one squashed 224px view, and save a disease heatmap.
+# At most TILE_BUDGET tiles are classified per image, TILE_BATCH_SIZE per forward pass.
+app.config['TILED_ANALYSIS'] = env_flag('TILED_ANALYSIS')
+app.config['TILE_BUDGET'] = int(os.environ.get('TILE_BUDGET', 32))
+app.config['TILE_OVERLAP'] = float(os.environ.get('TILE_OVERLAP', 0.25))
+app.config['TILE_BATCH_SIZE'] = int(os.environ.get('TILE_BATCH_SIZE', 16))
+
+# Test-time augmentation (flips and rotations, one batched pass) for scores within TTA_BAND of the 0.5 threshold
+app.config['TTA'] = env_flag('TTA')
+app.config['TTA_BAND'] = float(os.environ.get('TTA_BAND', 0.1))
+
+# Cascade: confident rule-based verdicts skip the CNN; thresholds come from tune_cascade.py
+app.config['CASCADE'] = env_flag('CASCADE')
+app.config['CASCADE_THRESHOLDS_PATH'] = os.environ.get('CASCADE_THRESHOLDS_PATH', DiseaseAnalyzer.CASCADE_THRESHOLDS_PATH)
+
+# Run analyses in this many worker processes (shared-memory image transfer); 0 analyzes in-process
+app.config['ANALYSIS_PROCESSES'] = int(os.environ.get('ANALYSIS_PROCESSES', 0))
+
+# Micro-batching of concurrent uploads (only helps with threaded workers, e.g. gunicorn --threads)
+app.config['INFERENCE_BATCHING'] = env_flag('INFERENCE_BATCHING')
+app.config['BATCH_MAX_SIZE'] = int(os.environ.get('BATCH_MAX_SIZE', 16))
+app.config['BATCH_MAX_WAIT_MS'] = float(os.environ.get('BATCH_MAX_WAIT_MS', 10))
+
+# Result cache keyed by image SHA-256 + model fingerprint; disk tier is optional
+app.config['PREDICTION_CACHE'] = env_flag('PREDICTION_CACHE', True)
+app.config['PREDICTION_CACHE_SIZE'] = int(os.environ.get('PREDICTION_CACHE_SIZE', 512))
+app.config['PREDICTION_CACHE_PATH'] = os.environ.get('PREDICTION_CACHE_PATH')
+app.config['PREDICTION_CACHE_MAX_MB'] = int(os.environ.get('PREDICTION_CACHE_MAX_MB', 256))
+
+# Bulk uploads: many images and/or ZIP archives of images in one request
+app.config['BULK_MAX_CONTENT_LENGTH'] = int(os.environ.get('BULK_MAX_CONTENT_MB', 512)) * 1024 * 1024
+app.config['BULK_MAX_FILES'] = int(os.environ.get('BULK_MAX_FILES', 1000))
+# Werkzeug rejects requests with more multipart parts than this (default 1000) with a 413
+app.config['MAX_FORM_PARTS'] = max(1000, app.config['BULK_MAX_FILES'] + 10)
+
+# Uploads under content-hashed URLs (/files/<sha256>/<name>) are cached by browsers as immutable for
+# UPLOAD_MAX_AGE seconds. UPLOAD_SENDFILE hands the bytes to the front proxy instead of a Python worker:
+# 'x-sendfile' (Apache mod_xsendfile, lighttpd) or 'x-accel' (nginx, with an internal location at
+# UPLOAD_ACCEL_PREFIX aliased to the upload folder)
+app.config['UPLOAD_MAX_AGE'] = int(os.environ.get('UPLOAD_MAX_AGE', 365 * 24 * 3600))
+app.config['UPLOAD_SENDFILE'] = os.environ.get('UPLOAD_SENDFILE', '').strip().lower()
+app.config['UPLOAD_ACCEL_PREFIX'] = os.environ.get('UPLOAD_ACCEL_PREFIX', '/protected-uploads/')
+if app.config['UPLOAD_SENDFILE'] not in ('', 'x-sendfile', 'x-accel'):
+    raise ValueError(f"Unknown UPLOAD_SENDFILE mode: {app.config['UPLOAD_SENDFILE']}")
+
+# Thumbnails for history and result pages: generated on first request into a sharded cache directory
+app.config['THUMBNAIL_DIR'] = os.environ.get('THUMBNAIL_DIR', 'thumbnails')
+app.config['THUMBNAIL_SIZES'] = [int(size) for size in os.environ.get('THUMBNAIL_SIZES', '160,320,640,1280').split(',')]
+app.config['THUMBNAIL_CACHE_MAX_MB'] = int(os.environ.get('THUMBNAIL_CACHE_MAX_MB', 512))
+app.config['THUMBNAIL_MAX_AGE'] = int(os.environ.get('THUMBNAIL_MAX_AGE', 86400))
+
+# Analyses per history page (keyset pagination, so deep pages cost the same as the first)
+app.config['HISTORY_PAGE_SIZE'] = int(os.environ.get('HISTORY_PAGE_SIZE', 20))
+# Seconds the history summary counts may be served from memory (other processes' writes show up after this)
+app.config['HISTORY_STATS_TTL'] = float(os.environ.get('HISTORY_STATS_TTL', 30))
+
+# Asynchronous analysis: uploads return immediately and a local worker pool (SQLite job table) analyzes them
+app.config['ASYNC_ANALYSIS'] = env_flag('ASYNC_ANALYSIS')
+app.config['ANALYSIS_JOB_WORKERS'] = int(os.environ.get('ANALYSIS_JOB_WORKERS', 2))
+app.config['ANALYSIS_JOB_DB'] = os.environ.get('ANALYSIS_JOB_DB', os.path.join(app.instance_path, 'jobs.db'))
+# Finished jobs are deleted from the job table this many hours after completion
+app.config['ANALYSIS_JOB_RETENTION_HOURS'] = float(os.environ.get('ANALYSIS_JOB_RETENTION_HOURS', 24))
+# A running job's lease is renewed every third of this; a job whose process died is retried once it lapses
+app.config['ANALYSIS_JOB_LEASE_SECONDS'] = float(os.environ.get('ANALYSIS_JOB_LEASE_SECONDS', 300))
+
+# Per-stage latency histograms and counters, served in Prometheus text format at /metrics
+app.config['METRICS'] = env_flag('METRICS', True)
+metrics.set_enabled(app.config['METRICS'])
+
+UPLOAD_SECONDS = metrics.histogram('plant_upload_seconds', 'End-to-end upload request time', 'route')
+UPLOAD_STAGE_SECONDS = metrics.histogram('plant_upload_stage_seconds', 'Time spent in each upload route stage', 'stage')
+UPLOAD_ERRORS = metrics.counter('plant_upload_errors_total', 'Upload requests that failed with an error', 'route')
+
+# On-demand profiling: with PROFILING=1, an upload sent by one of PROFILE_ADMINS (comma-separated
+# usernames) with an X-Profile: 1 header or ?profile=1 is sampled into a collapsed-stack file
+app.config['PROFILING'] = env_flag('PROFILING')
+app.config['PROFILE_ADMINS'] = {name.strip() for name in os.environ.get('PROFILE_ADMINS', '').split(',') if name.strip()}
+app.config['PROFILE_DIR'] = os.environ.get('PROFILE_DIR', 'profiles')
+app.config['PROFILE_KEEP'] = int(os.environ.get('PROFILE_KEEP', 50))
+app.config['PROFILE_INTERVAL_MS'] = float(os.environ.get('PROFILE_INTERVAL_MS', 1))
+
 # Initialize database
 db.init_app(app)
 
-# Ensure upload directory exists
-os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+# Uploads are stored once per distinct content, as <UPLOAD_FOLDER>/<ab>/<cd>/<sha256>
+# (older, unmigrated uploads stay flat in UPLOAD_FOLDER; see migrate_uploads.py)
+blob_store = BlobStore(UPLOAD_FOLDER)
 
 # Initialize disease analyzer once (cached for performance)
-disease_analyzer = DiseaseAnalyzer()
-app.logger.info('DiseaseAnalyzer initialized and ready')
+analyzer_options = dict(
+    compiled_inference=app.config['COMPILED_INFERENCE'],
+    jit_compile=app.config['XLA_JIT'],
+    backend=app.config['ANALYZER_BACKEND'],
+    tflite_path=app.config['TFLITE_MODEL_PATH'],
+    num_threads=app.config['TFLITE_THREADS'],
+    model_wait_timeout=app.config['MODEL_WAIT_TIMEOUT'],
+    working_resolution=app.config['WORKING_RESOLUTION'],
+    pixel_budget=app.config['ANALYSIS_PIXEL_BUDGET'],
+    tiled=app.config['TILED_ANALYSIS'],
+    tile_budget=app.config['TILE_BUDGET'],
+    tile_overlap=app.config['TILE_OVERLAP'],
+    tile_batch_size=app.config['TILE_BATCH_SIZE'],
+    tta=app.config['TTA'],
+    tta_band=app.config['TTA_BAND'],
+    cascade=app.config['CASCADE'],
+    cascade_path=app.config['CASCADE_THRESHOLDS_PATH']
+)
+# Spawned workers re-import this module (and __main__); only the server process starts a pool
+use_analysis_pool = app.config['ANALYSIS_PROCESSES'] > 0 and multiprocessing.current_process().name == 'MainProcess'
+# With a pool, only the workers load the model; this process decodes and takes their model state
+disease_analyzer = DiseaseAnalyzer(
+    load_in_background=app.config['MODEL_BACKGROUND_LOAD'],
+    load_model=not use_analysis_pool,
+    **analyzer_options
+)
+app.logger.info(f"DiseaseAnalyzer initialized (model {disease_analyzer.model_state})")
+
+# Concurrent uploads share forward passes through the batcher when enabled
+inference_batcher = None
+if app.config['INFERENCE_BATCHING']:
+    inference_batcher = MicroBatcher(
+        disease_analyzer,
+        max_batch_size=app.config['BATCH_MAX_SIZE'],
+        max_wait_ms=app.config['BATCH_MAX_WAIT_MS']
+    )
+    app.logger.info(f"Inference micro-batching enabled (max batch {app.config['BATCH_MAX_SIZE']}, "
+                    f"max wait {app.config['BATCH_MAX_WAIT_MS']}ms)")
+
+analysis_pool = None
+if use_analysis_pool:
+    analysis_pool = AnalysisPool(
+        disease_analyzer,
+        max_workers=app.config['ANALYSIS_PROCESSES'],
+        analyzer_kwargs=analyzer_options
+    )
+    app.logger.info(f"Analysis process pool enabled ({app.config['ANALYSIS_PROCESSES']} workers)")
+
+prediction_cache = None
+if app.config['PREDICTION_CACHE']:
+    prediction_cache = PredictionCache(
+        max_entries=app.config['PREDICTION_CACHE_SIZE'],
+        disk_path=app.config['PREDICTION_CACHE_PATH'],
+        disk_max_bytes=app.config['PREDICTION_CACHE_MAX_MB'] * 1024 * 1024
+    )
+
+thumbnail_cache = ThumbnailCache(
+    app.config['THUMBNAIL_DIR'],
+    sizes=app.config['THUMBNAIL_SIZES'],
+    max_bytes=app.config['THUMBNAIL_CACHE_MAX_MB'] * 1024 * 1024
+)
+
+def analyze_upload(filepath, digest=None):
+    """Analyze a saved upload, reusing the cached result for byte-identical images."""
+    analyzer = analysis_pool or inference_batcher or disease_analyzer
+    if prediction_cache is None:
+        return analyzer.analyze_image(filepath)
+    
+    if digest is None:
+        digest = file_sha256(filepath)
+    result = prediction_cache.get_or_compute(
+        digest,
+        disease_analyzer.result_fingerprint(),
+        lambda: analyzer.analyze_image(filepath)
+    )
+    if result['analysis_details'].get('cache_hit'):
+        app.logger.info(f"Prediction cache hit for {os.path.basename(filepath)}")
+    return result
+
+def analyze_uploads(filepaths, digests):
+    """
+    Bulk analyze_upload: cached results are reused and everything else goes
+    through one analyze_batch call (or is spread over the process pool when
+    enabled). A failed image yields its exception.
+    """
+    fingerprint = disease_analyzer.result_fingerprint()
+    results = [None] * len(filepaths)
+    
+    if prediction_cache is not None:
+        for i, filepath in enumerate(filepaths):
+            results[i] = prediction_cache.get(digests[i], fingerprint)
+    
+    missing = [i for i, result in enumerate(results) if result is None]
+    if analysis_pool is not None:
+        futures = []
+        for i in missing:
+            try:
+                futures.append(analysis_pool.submit(filepaths[i]))
+            except Exception as e:
+                futures.append(e)
+        computed = [f if isinstance(f, Exception) else (f.exception() or f.result()) for f in futures]
+    else:
+        computed = disease_analyzer.analyze_batch([filepaths[i] for i in missing], return_exceptions=True)
+    for i, result in zip(missing, computed):
+        if prediction_cache is not None and not isinstance(result, Exception):
+            prediction_cache.put(digests[i], fingerprint, result)
+            result['analysis_details']['cache_hit'] = False
+        results[i] = result
+    
+    return results
+
+def save_heatmap(result, image_filename):
+    """
+    Write the tiled-mode heatmap overlay to the upload folder; returns its
+    filename, or None. Upload names are only unique per second and user, so
+    each heatmap gets a random suffix and is never shared between analyses.
+    """
+    heatmap = result['analysis_details'].get('tile_heatmap')
+    if not heatmap:
+        return None
+    
+    heatmap_filename = f"heatmap_{os.path.splitext(image_filename)[0]}_{uuid.uuid4().hex}.png"
+    try:
+        DiseaseAnalyzer.render_heatmap(heatmap).save(os.path.join(app.config['UPLOAD_FOLDER'], heatmap_filename))
+    except OSError as e:
+        app.logger.error(f"Could not save heatmap: {e}")
+        return None
+    return heatmap_filename
+
+def analysis_fields(result):
+    """Analysis column values for an analyze_image result, including its numeric analysis_details."""
+    details = result['analysis_details']
+    fields = {
+        'disease_detected': result['disease_name'],
+        'confidence': result['confidence'],
+        'severity': result['severity'],
+        'disease_key': result['disease']
+    }
+    fields.update({field: details.get(field) for field in Analysis.FEATURE_FIELDS})
+    return fields
+
+def run_analysis_job(payload):
+    """Job handler: analyze a queued upload and fill in its pending Analysis row."""
+    with app.app_context():
+        analysis = Analysis.query.get(payload['analysis_id'])
+        if analysis is None or analysis.status != 'pending':
+            return
+        
+        try:
+            result = analyze_upload(payload['filepath'], analysis.image_sha256)
+        except Exception as e:
+            # A bad image fails the same way every time, so it is not retried
+            app.logger.error(f"Analysis error: {e}")
+            analysis.mark_failed()
+        else:
+            for field, value in analysis_fields(result).items():
+                setattr(analysis, field, value)
+            analysis.heatmap_filename = save_heatmap(result, analysis.image_filename)
+            analysis.status = 'complete'
+        db.session.commit()
+
+def fail_analysis_job(payload, error):
+    """Job queue gave up (e.g. repeated database errors): don't leave the row pending forever."""
+    with app.app_context():
+        analysis = Analysis.query.get(payload['analysis_id'])
+        if analysis is not None and analysis.status == 'pending':
+            analysis.mark_failed()
+            db.session.commit()
 
 # Add cache control headers to prevent caching issues
 @app.after_request
@@ -53,6 +345,10 @@ def add_header(response):
 # Create database tables and add default user
 with app.app_context():
     db.create_all()
+    add_missing_columns(db)
+    DiseaseInfo.seed(DiseaseAnalyzer.DISEASE_DATABASE)
+    move_disease_text(db)
+    add_missing_indexes(db)
     
     # Create default demo user if it doesn't exist
     demo_user = User.query.filter_by(username='demo').first()
@@ -67,6 +363,18 @@ with app.app_context():
         db.session.commit()
         app.logger.info('Default demo user created: username=demo, password=demo123')
 
+job_queue = None
+if app.config['ASYNC_ANALYSIS'] and multiprocessing.current_process().name == 'MainProcess':
+    job_queue = JobQueue(
+        app.config['ANALYSIS_JOB_DB'],
+        run_analysis_job,
+        workers=app.config['ANALYSIS_JOB_WORKERS'],
+        on_failure=fail_analysis_job,
+        lease_seconds=app.config['ANALYSIS_JOB_LEASE_SECONDS'],
+        retention_seconds=app.config['ANALYSIS_JOB_RETENTION_HOURS'] * 3600
+    )
+    app.logger.info(f"Asynchronous analysis enabled ({app.config['ANALYSIS_JOB_WORKERS']} job workers)")
+
 def allowed_file(filename):
     """Check if file extension is allowed."""
     if not filename:
@@ -74,6 +382,45 @@ def allowed_file(filename):
     return '.' in filename and \
            filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+def stream_size(stream):
+    """Size of a seekable upload stream (multipart files are spooled to memory or disk)."""
+    position = stream.tell()
+    size = stream.seek(0, os.SEEK_END)
+    stream.seek(position)
+    return size
+
+def iter_bulk_images(uploads, skipped):
+    """
+    Yield (name, stream) for every image in a bulk upload, reading ZIP entries
+    straight from the uploaded archive. Anything unusable is appended to
+    skipped as (name, reason).
+    """
+    for upload in uploads:
+        if not upload.filename.lower().endswith('.zip'):
+            if not allowed_file(upload.filename):
+                skipped.append((upload.filename, 'not a supported image type'))
+            elif stream_size(upload.stream) > MAX_FILE_SIZE:
+                skipped.append((upload.filename, 'larger than 16MB'))
+            else:
+                yield upload.filename, upload.stream
+            continue
+        
+        try:
+            with zipfile.ZipFile(upload.stream) as archive:
+                for info in archive.infolist():
+                    name = info.filename
+                    if info.is_dir() or name.startswith('__MACOSX/') or os.path.basename(name).startswith('.'):
+                        continue
+                    if not allowed_file(name):
+                        skipped.append((name, 'not a supported image type'))
+                    elif info.file_size > MAX_FILE_SIZE:
+                        skipped.append((name, 'larger than 16MB'))
+                    else:
+                        with archive.open(info) as stream:
+                            yield name, stream
+        except zipfile.BadZipFile:
+            skipped.append((upload.filename, 'not a valid ZIP archive'))
+
 def login_required(f):
     """Decorator to require login for certain routes"""
     from functools import wraps
@@ -85,6 +432,37 @@ def login_required(f):
         return f(*args, **kwargs)
     return decorated_function
 
+def profile_requested():
+    """Whether this request asked to be profiled and is allowed to."""
+    if not app.config['PROFILING']:
+        return False
+    if request.headers.get('X-Profile') != '1' and request.args.get('profile') != '1':
+        return False
+    return session.get('username') in app.config['PROFILE_ADMINS']
+
+def profiled(label):
+    """
+    Decorator: sample the view into PROFILE_DIR when profile_requested(). The
+    response carries the profile's filename in an X-Profile-File header.
+    """
+    from functools import wraps
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            if not profile_requested():
+                return f(*args, **kwargs)
+            
+            profiler = SamplingProfiler(interval=app.config['PROFILE_INTERVAL_MS'] / 1000.0)
+            with profiler:
+                response = app.make_response(f(*args, **kwargs))
+            path = profiler.save(label, app.config['PROFILE_DIR'], app.config['PROFILE_KEEP'])
+            app.logger.info(f"Profiled {request.path} for {session.get('username')}: "
+                            f"{profiler.samples} samples in {profiler.elapsed * 1000:.0f}ms -> {path}")
+            response.headers['X-Profile-File'] = os.path.basename(path)
+            return response
+        return decorated_function
+    return decorator
+
 @app.route('/')
 @login_required
 def index():
@@ -196,6 +574,8 @@ def logout():
 
 @app.route('/upload', methods=['POST'])
 @login_required
+@profiled('upload')
+@UPLOAD_SECONDS.timed('upload')
 def upload_file():
     """Handle file upload and perform disease analysis."""
     if 'file' not in request.files:
@@ -216,35 +596,134 @@ def upload_file():
         filename = secure_filename(file.filename)
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
         unique_filename = f"{timestamp}_{filename}"
-        filepath = os.path.join(app.config['UPLOAD_FOLDER'], unique_filename)
         
-        file.save(filepath)
+        # Hashed while it is written; a repeat of an earlier upload is not stored again
+        with UPLOAD_STAGE_SECONDS.time('save'):
+            digest, _, _ = blob_store.save(file.stream)
+        filepath = blob_store.path(digest)
         
-        result = disease_analyzer.analyze_image(filepath)
+        if job_queue is not None:
+            analysis = Analysis.pending(session['user_id'], unique_filename)
+            analysis.image_sha256 = digest
+            db.session.add(analysis)
+            db.session.commit()
+            try:
+                job_queue.enqueue({'analysis_id': analysis.id, 'filepath': filepath})
+            except Exception:
+                # No job will ever pick it up; don't leave it showing as queued
+                analysis.mark_failed()
+                db.session.commit()
+                raise
+            
+            status_url = url_for('analysis_status', analysis_id=analysis.id)
+            if request.accept_mimetypes.best == 'application/json':
+                body = {
+                    'id': analysis.id,
+                    'status': analysis.status,
+                    'status_url': status_url,
+                    'result_url': url_for('view_result', analysis_id=analysis.id)
+                }
+                return jsonify(body), 202, {'Location': status_url}
+            flash('Image uploaded! Analysis is in progress.', 'success')
+            return redirect(url_for('view_result', analysis_id=analysis.id))
+        
+        with UPLOAD_STAGE_SECONDS.time('analyze'):
+            result = analyze_upload(filepath, digest)
         
         analysis = Analysis(
             user_id=session['user_id'],
             image_filename=unique_filename,
-            disease_detected=result['disease_name'],
-            confidence=result['confidence'],
-            severity=result['severity'],
-            description=result['description'],
-            treatment=result['treatment'],
-            prevention=result['prevention']
+            image_sha256=digest,
+            heatmap_filename=save_heatmap(result, unique_filename),
+            **analysis_fields(result)
         )
         
-        db.session.add(analysis)
-        db.session.commit()
+        with UPLOAD_STAGE_SECONDS.time('db_commit'):
+            db.session.add(analysis)
+            db.session.commit()
         
         flash('Image analyzed successfully!', 'success')
         return redirect(url_for('view_result', analysis_id=analysis.id))
         
     except Exception as e:
         db.session.rollback()
+        UPLOAD_ERRORS.inc('upload')
         app.logger.error(f"Analysis error: {e}")
         flash('An error occurred during analysis. Please try again.', 'error')
         return redirect(url_for('index'))
 
+@app.route('/upload/bulk', methods=['POST'])
+@login_required
+@profiled('bulk')
+@UPLOAD_SECONDS.timed('bulk')
+def bulk_upload():
+    """Analyze many images, or ZIP archives of images, in one request."""
+    start = time.perf_counter()
+    request.max_content_length = app.config['BULK_MAX_CONTENT_LENGTH']
+    
+    uploads = [f for f in request.files.getlist('files') if f.filename]
+    if not uploads:
+        flash('No files selected', 'error')
+        return redirect(url_for('index'))
+    
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    saved = []
+    skipped = []
+    analyses = []
+    
+    try:
+        for name, stream in iter_bulk_images(uploads, skipped):
+            if len(saved) >= app.config['BULK_MAX_FILES']:
+                skipped.append((name, f"more than {app.config['BULK_MAX_FILES']} images in one upload"))
+                continue
+            
+            # Index prefix keeps names unique when archives repeat a filename in different folders
+            filename = secure_filename(os.path.basename(name)) or f"image.{name.rsplit('.', 1)[1].lower()}"
+            unique_filename = f"{timestamp}_{len(saved):04d}_{filename}"
+            digest, _, _ = blob_store.save(stream)
+            saved.append((name, unique_filename, blob_store.path(digest), digest))
+        
+        results = analyze_uploads([filepath for _, _, filepath, _ in saved], [digest for _, _, _, digest in saved])
+        
+        for (name, unique_filename, filepath, digest), result in zip(saved, results):
+            if isinstance(result, Exception):
+                # Its blob may be shared, so it is left for garbage collection
+                skipped.append((name, 'could not be analyzed'))
+                continue
+            analyses.append(Analysis(
+                user_id=session['user_id'],
+                image_filename=unique_filename,
+                image_sha256=digest,
+                heatmap_filename=save_heatmap(result, unique_filename),
+                **analysis_fields(result)
+            ))
+        
+        # One transaction for the whole batch
+        db.session.add_all(analyses)
+        db.session.commit()
+        
+    except Exception as e:
+        db.session.rollback()
+        # Unreferenced blobs are left for garbage collection (another analysis may share them)
+        leftovers = [os.path.join(app.config['UPLOAD_FOLDER'], a.heatmap_filename) for a in analyses if a.heatmap_filename]
+        for filepath in leftovers:
+            if os.path.exists(filepath):
+                os.remove(filepath)
+        UPLOAD_ERRORS.inc('bulk')
+        app.logger.error(f"Bulk analysis error: {e}")
+        flash('An error occurred during bulk analysis. Please try again.', 'error')
+        return redirect(url_for('index'))
+    
+    elapsed = time.perf_counter() - start
+    app.logger.info(f"Bulk upload: {len(analyses)} analyzed, {len(skipped)} skipped in {elapsed:.2f}s")
+    
+    return render_template(
+        'bulk_result.html',
+        analyses=analyses,
+        skipped=skipped,
+        elapsed=elapsed
+    )
+
 @app.route('/result/<int:analysis_id>')
 @login_required
 def view_result(analysis_id):
@@ -257,20 +736,252 @@ def view_result(analysis_id):
     
     return render_template('result.html', analysis=analysis)
 
+@app.route('/result/<int:analysis_id>/status')
+@login_required
+def analysis_status(analysis_id):
+    """JSON status of an analysis, polled by the result page while its job is pending."""
+    analysis = Analysis.query.get_or_404(analysis_id)
+    
+    if analysis.user_id != session['user_id']:
+        return jsonify({'error': 'forbidden'}), 403
+    
+    body = {
+        'id': analysis.id,
+        'status': analysis.status,
+        'result_url': url_for('view_result', analysis_id=analysis.id)
+    }
+    if analysis.is_complete:
+        body.update({
+            'disease_detected': analysis.disease_detected,
+            'confidence': analysis.confidence,
+            'severity': analysis.severity,
+            'analysis_details': analysis.analysis_details
+        })
+    return jsonify(body)
+
+# The summary counts scan all of a user's rows, unlike a page, so they are cached
+# briefly and dropped whenever this process writes one of the user's analyses
+history_stats_cache = {}
+
+@event.listens_for(Analysis, 'after_insert')
+@event.listens_for(Analysis, 'after_update')
+def invalidate_history_stats(mapper, connection, analysis):
+    history_stats_cache.pop(analysis.user_id, None)
+
+def history_stats(user_id):
+    """Analysis.history_stats, cached for HISTORY_STATS_TTL seconds."""
+    cached = history_stats_cache.get(user_id)
+    if cached is not None and cached[0] > time.monotonic():
+        return cached[1]
+    
+    stats = Analysis.history_stats(user_id)
+    history_stats_cache[user_id] = (time.monotonic() + app.config['HISTORY_STATS_TTL'], stats)
+    return stats
+
+def encode_cursor(analysis):
+    """History page cursor for an analysis row: its created_at and id."""
+    return f"{analysis.created_at.isoformat()}_{analysis.id}"
+
+def decode_cursor(value):
+    """(created_at, id) from encode_cursor's output; 400 if it is malformed."""
+    try:
+        created_at, analysis_id = value.rsplit('_', 1)
+        return datetime.fromisoformat(created_at), int(analysis_id)
+    except ValueError:
+        abort(400)
+
 @app.route('/history')
 @login_required
 def history():
-    """View analysis history."""
+    """View analysis history, one keyset-paginated page at a time."""
     user = User.query.get(session['user_id'])
-    analyses = Analysis.query.filter_by(user_id=session['user_id']).order_by(Analysis.created_at.desc()).all()
-    return render_template('history.html', user=user, analyses=analyses)
+    before = request.args.get('before')
+    after = None if before else request.args.get('after')
+    
+    analyses, more = Analysis.history_page(
+        session['user_id'],
+        app.config['HISTORY_PAGE_SIZE'],
+        before=decode_cursor(before) if before else None,
+        after=decode_cursor(after) if after else None
+    )
+    
+    # Coming from an older page (after=) means older rows exist, and from a newer one (before=) newer rows do
+    if after:
+        has_newer, has_older = more, True
+    else:
+        has_newer, has_older = bool(before), more
+    older_url = url_for('history', before=encode_cursor(analyses[-1])) if analyses and has_older else None
+    newer_url = url_for('history', after=encode_cursor(analyses[0])) if analyses and has_newer else None
+    
+    return render_template(
+        'history.html',
+        user=user,
+        analyses=analyses,
+        stats=history_stats(session['user_id']),
+        older_url=older_url,
+        newer_url=newer_url,
+        newest_url=url_for('history') if has_newer else None
+    )
+
+def upload_source(filename, digest=None):
+    """
+    Path of an upload below the upload folder: its blob when the digest is
+    known and stored, otherwise the flat file of an unmigrated upload. None if
+    filename is unsafe.
+    """
+    if digest and blob_store.exists(digest):
+        return blob_store.relative_path(digest)
+    if safe_join(app.config['UPLOAD_FOLDER'], filename) is None:
+        return None
+    return filename
+
+def send_upload(filename, digest=None):
+    """
+    Response for an upload. With the file's SHA-256 the URL is
+    content-hashed, so the response is immutable and the digest is its
+    strong ETag. If-None-Match/If-Modified-Since and Range are answered here,
+    or by the front proxy in UPLOAD_SENDFILE mode.
+    """
+    from flask import send_file
+    source = upload_source(filename, digest)
+    if source is None:
+        abort(404)
+    path = os.path.join(app.config['UPLOAD_FOLDER'], source)
+    if not os.path.isfile(path):
+        abort(404)
+    
+    # Blobs have no extension, so the type comes from the upload's name
+    mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    mode = app.config['UPLOAD_SENDFILE']
+    if mode:
+        response = app.response_class(mimetype=mimetype)
+        if digest:
+            response.set_etag(digest)
+        response.last_modified = os.path.getmtime(path)
+        response.make_conditional(request)
+        if response.status_code != 304:
+            if mode == 'x-accel':
+                response.headers['X-Accel-Redirect'] = app.config['UPLOAD_ACCEL_PREFIX'] + quote(source)
+            else:
+                response.headers['X-Sendfile'] = os.path.abspath(path)
+    else:
+        response = send_file(path, mimetype=mimetype, etag=digest or True, conditional=True)
+    
+    if digest:
+        # Behind login, so browsers may keep it but shared caches must not
+        response.headers['Cache-Control'] = f"private, max-age={app.config['UPLOAD_MAX_AGE']}, immutable"
+    return response
+
+@app.template_global()
+def upload_url(analysis):
+    """URL of an analysis's uploaded image: content-hashed when its digest is known."""
+    if analysis.image_sha256:
+        return url_for('upload_by_digest', digest=analysis.image_sha256, filename=analysis.image_filename)
+    return url_for('uploaded_file', filename=analysis.image_filename)
 
 @app.route('/uploads/<filename>')
 @login_required
 def uploaded_file(filename):
     """Serve uploaded files."""
-    from flask import send_from_directory
-    return send_from_directory(app.config['UPLOAD_FOLDER'], filename)
+    return send_upload(filename)
+
+@app.route('/files/<digest>/<filename>')
+@login_required
+def upload_by_digest(digest, filename):
+    """Serve an upload under its content-hashed, immutable URL."""
+    if not re.fullmatch(r'[0-9a-f]{64}', digest):
+        abort(404)
+    return send_upload(filename, digest)
+
+def thumbnail_for(analysis, size):
+    if analysis.image_sha256:
+        return url_for('thumbnail', size=size, digest=analysis.image_sha256, filename=analysis.image_filename)
+    return url_for('thumbnail', size=size, filename=analysis.image_filename)
+
+@app.template_global()
+def thumbnail_url(analysis, width):
+    """URL of the smallest configured thumbnail of an analysis's image at least width px wide (or the largest)."""
+    size = next((size for size in thumbnail_cache.sizes if size >= width), thumbnail_cache.sizes[-1])
+    return thumbnail_for(analysis, size)
+
+@app.template_global()
+def thumbnail_srcset(analysis):
+    """srcset attribute value offering every thumbnail size of an analysis's image."""
+    return ', '.join(f"{thumbnail_for(analysis, size)} {size}w" for size in thumbnail_cache.sizes)
+
+@app.route('/thumbs/<int:size>/<filename>')
+@app.route('/thumbs/<int:size>/<digest>/<filename>')
+@login_required
+def thumbnail(size, filename, digest=None):
+    """Serve a downscaled copy of an upload, generating it on first request."""
+    from flask import send_file
+    if digest is not None and not re.fullmatch(r'[0-9a-f]{64}', digest):
+        abort(404)
+    source = upload_source(filename, digest)
+    if size not in thumbnail_cache.sizes or source is None:
+        abort(404)
+    
+    try:
+        # Keyed by the blob's digest, so identical uploads share thumbnails
+        path = thumbnail_cache.get(os.path.join(app.config['UPLOAD_FOLDER'], source), size)
+    except FileNotFoundError:
+        abort(404)
+    except OSError as e:
+        app.logger.error(f"Could not create thumbnail for {filename}: {e}")
+        abort(404)
+    response = send_file(path, mimetype=thumbnail_cache.mimetype)
+    # Behind login, so browsers may keep it but shared caches must not
+    if digest:
+        response.headers['Cache-Control'] = f"private, max-age={app.config['UPLOAD_MAX_AGE']}, immutable"
+    else:
+        response.headers['Cache-Control'] = f"private, max-age={app.config['THUMBNAIL_MAX_AGE']}"
+    return response
+
+@app.route('/ready')
+def readiness():
+    """Readiness probe: 503 while the model is still loading, 200 once analysis is fully available."""
+    state = disease_analyzer.model_state
+    body = {
+        'status': 'loading' if state == 'loading' else 'ready',
+        'model_state': state,
+        'backend': disease_analyzer.backend,
+        'ml_powered': disease_analyzer.model_loaded,
+        'analysis_paths': disease_analyzer.path_counts()
+    }
+    return jsonify(body), 503 if state == 'loading' else 200
+
+def collect_metrics():
+    """Scrape-time values already counted by the analyzer, cache, batcher and job queue."""
+    yield ('plant_model_loaded', 'gauge', 'Whether the CNN is loaded (1) or analysis is rule-based only (0)',
+           [({}, int(disease_analyzer.model_loaded))])
+    yield ('plant_analysis_path_total', 'counter', 'Results by analysis path (model, cascade or rules)',
+           [({'path': path}, count) for path, count in disease_analyzer.path_counts().items()])
+    
+    if prediction_cache is not None:
+        stats = prediction_cache.stats()
+        yield ('plant_prediction_cache_hits_total', 'counter', 'Prediction cache hits', [({}, stats['hits'])])
+        yield ('plant_prediction_cache_misses_total', 'counter', 'Prediction cache misses', [({}, stats['misses'])])
+        yield ('plant_prediction_cache_entries', 'gauge', 'Results held in the in-memory cache tier',
+               [({}, stats['memory_entries'])])
+    
+    if inference_batcher is not None:
+        stats = inference_batcher.stats()
+        yield ('plant_batcher_queue_depth', 'gauge', 'Prepared images waiting for a forward pass', [({}, stats['queue_depth'])])
+        yield ('plant_batcher_batches_total', 'counter', 'Batched forward passes run', [({}, stats['batches'])])
+        yield ('plant_batcher_requests_total', 'counter', 'Images scored through the batcher', [({}, stats['requests'])])
+    
+    if job_queue is not None:
+        yield ('plant_analysis_jobs', 'gauge', 'Analysis jobs by status',
+               [({'status': status}, count) for status, count in job_queue.stats().items()])
+
+metrics.register_collector(collect_metrics)
+
+@app.route('/metrics')
+def prometheus_metrics():
+    """Prometheus scrape endpoint (404 when METRICS is off)."""
+    if not app.config['METRICS']:
+        abort(404)
+    return app.response_class(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
 
 @app.route('/presentation')
 def presentation():
@@ -280,7 +991,10 @@ def presentation():
 @app.errorhandler(413)
 def too_large(e):
     """Handle file too large error."""
-    flash('File too large. Please upload an image smaller than 16MB.', 'error')
+    if request.endpoint == 'bulk_upload':
+        flash(f"Upload too large. Bulk uploads are limited to {app.config['BULK_MAX_CONTENT_LENGTH'] // (1024 * 1024)}MB.", 'error')
+    else:
+        flash('File too large. Please upload an image smaller than 16MB.', 'error')
     return redirect(url_for('index'))
 
 if __name__ == '__main__':
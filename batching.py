@@ -0,0 +1,115 @@
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from analysis import ANALYSIS_ERRORS
+
+logger = logging.getLogger(__name__)
+
+
+class MicroBatcher:
+    """
+    Coalesces concurrent single-image requests into batched forward passes
+    on a shared DiseaseAnalyzer.
+
+    Request threads decode and preprocess their own image, enqueue the model
+    input and wait on a future. One worker thread flushes the queue as soon as
+    max_batch_size inputs are waiting or the oldest one has waited max_wait_ms.
+    """
+
+    def __init__(self, analyzer, max_batch_size=16, max_wait_ms=10):
+        self.analyzer = analyzer
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._batches = 0
+        self._requests = 0
+        self._max_queue_depth = 0
+        self._batch_sizes = {}
+
+        self._worker = threading.Thread(target=self._run, name='micro-batcher', daemon=True)
+        self._worker.start()
+
+    def analyze_image(self, image_path, timeout=None):
+        """Drop-in replacement for DiseaseAnalyzer.analyze_image."""
+        if not self.analyzer._model_available():
+            return self.analyzer.analyze_image(image_path)
+
+        try:
+            features, model_input = self.analyzer._prepare_image(image_path, use_model=True)
+        except Exception as e:
+            ANALYSIS_ERRORS.inc()
+            logger.error(f"Image analysis failed: {e}")
+            raise Exception(f"Image analysis failed: {str(e)}")
+
+        if model_input is None:
+            # Rule-based verdict (cascade accepted it, model unavailable or input
+            # preparation failed): nothing to batch
+            return self.analyzer._score_batch([(features, None)])[0]
+        
+        return self.submit(features, model_input).result(timeout)
+
+    def submit(self, features, model_input):
+        """Queue one prepared image; the returned future resolves to its result dict."""
+        future = Future()
+        self._queue.put((features, model_input, future))
+
+        depth = self._queue.qsize()
+        if depth > self._max_queue_depth:
+            with self._lock:
+                self._max_queue_depth = max(self._max_queue_depth, depth)
+        return future
+
+    def stats(self):
+        """Queue depth and achieved batch size counters."""
+        with self._lock:
+            return {
+                'queue_depth': self._queue.qsize(),
+                'max_queue_depth': self._max_queue_depth,
+                'batches': self._batches,
+                'requests': self._requests,
+                'average_batch_size': round(self._requests / self._batches, 2) if self._batches else 0.0,
+                'batch_size_histogram': dict(sorted(self._batch_sizes.items())),
+                'max_batch_size': self.max_batch_size,
+                'max_wait_ms': self.max_wait * 1000.0,
+            }
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.max_wait
+
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                try:
+                    if remaining > 0:
+                        batch.append(self._queue.get(timeout=remaining))
+                    else:
+                        batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            self._flush(batch)
+
+    def _flush(self, batch):
+        with self._lock:
+            self._batches += 1
+            self._requests += len(batch)
+            self._batch_sizes[len(batch)] = self._batch_sizes.get(len(batch), 0) + 1
+
+        logger.debug(f"Flushing batch of {len(batch)} (queue depth {self._queue.qsize()})")
+
+        try:
+            results = self.analyzer._score_batch([(features, model_input) for features, model_input, _ in batch])
+        except Exception as e:
+            ANALYSIS_ERRORS.inc(amount=len(batch))
+            logger.error(f"Batched analysis failed: {e}")
+            for _, _, future in batch:
+                future.set_exception(Exception(f"Image analysis failed: {str(e)}"))
+            return
+
+        for (_, _, future), result in zip(batch, results):
+            future.set_result(result)
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Benchmark the bulk upload endpoint against looping over /upload.
+
+Uses the Flask test client against a throwaway SQLite database with the
+prediction cache disabled. The same images are posted once per request to
+/upload (following the redirect to the result page, as a browser would) and
+then as a single ZIP archive to /upload/bulk. Reports images/second for
+each. Blobs the run added to the upload store and the database are removed
+afterwards.
+
+Usage: python benchmark_bulk_upload.py [--images 64]
+"""
+import argparse
+import io
+import os
+import tempfile
+import time
+import zipfile
+
+IMAGE_DIRECTORY = 'xyz'
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare /upload in a loop with /upload/bulk.')
+    parser.add_argument('--images', type=int, default=64)
+    args = parser.parse_args()
+
+    database = os.path.join(tempfile.mkdtemp(), 'benchmark.db')
+    os.environ['DATABASE_URL'] = f"sqlite:///{database}"
+    os.environ['PREDICTION_CACHE'] = '0'
+    os.environ['ASYNC_ANALYSIS'] = '0'
+    os.environ.setdefault('SESSION_SECRET', 'benchmark')
+
+    import logging
+    from app import app, db, blob_store, disease_analyzer
+    from models import Analysis
+    logging.disable(logging.CRITICAL)
+
+    names = sorted(f for f in os.listdir(IMAGE_DIRECTORY) if f.lower().endswith(IMAGE_EXTENSIONS))
+    names = (names * (args.images // len(names) + 1))[:args.images]
+    images = []
+    for name in names:
+        with open(os.path.join(IMAGE_DIRECTORY, name), 'rb') as f:
+            images.append((name, f.read()))
+
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, 'w', zipfile.ZIP_STORED) as zf:
+        for i, (name, data) in enumerate(images):
+            zf.writestr(f"field/{i:04d}_{name}", data)
+
+    existing_blobs = {digest for digest, _, _ in blob_store.iter_blobs()}
+    client = app.test_client()
+    client.post('/login', data={'username_or_email': 'demo', 'password': 'demo123'})
+    disease_analyzer.wait_for_model()
+    print(f"{len(images)} images, model {disease_analyzer.model_state}")
+
+    try:
+        # Warm-up so neither run pays for first-call tracing
+        client.post('/upload', data={'file': (io.BytesIO(images[0][1]), images[0][0])},
+                    content_type='multipart/form-data', follow_redirects=True)
+
+        start = time.perf_counter()
+        for name, data in images:
+            response = client.post('/upload', data={'file': (io.BytesIO(data), name)},
+                                   content_type='multipart/form-data', follow_redirects=True)
+            assert response.status_code == 200
+        loop_time = time.perf_counter() - start
+
+        archive.seek(0)
+        start = time.perf_counter()
+        response = client.post('/upload/bulk', data={'files': (archive, 'field.zip')},
+                               content_type='multipart/form-data')
+        bulk_time = time.perf_counter() - start
+        assert response.status_code == 200
+
+        with app.app_context():
+            bulk_rows = Analysis.query.count() - len(images) - 1
+    finally:
+        with app.app_context():
+            for digest in {analysis.image_sha256 for analysis in Analysis.query.all()} - existing_blobs:
+                if digest and blob_store.exists(digest):
+                    os.remove(blob_store.path(digest))
+            db.drop_all()
+        os.remove(database)
+
+    print("\n" + "=" * 60)
+    print("BULK UPLOAD THROUGHPUT")
+    print("=" * 60)
+    print(f"{'Method':<24} {'Seconds':>9} {'img/s':>9} {'ms/img':>9}")
+    print(f"{'/upload loop':<24} {loop_time:>9.2f} {len(images) / loop_time:>9.1f} {loop_time * 1000 / len(images):>9.1f}")
+    print(f"{'/upload/bulk (ZIP)':<24} {bulk_time:>9.2f} {len(images) / bulk_time:>9.1f} {bulk_time * 1000 / len(images):>9.1f}")
+    print("=" * 60)
+    print(f"Speedup: {loop_time / bulk_time:.1f}x ({bulk_rows} rows inserted by the bulk request)")
+
+
+if __name__ == '__main__':
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    main()
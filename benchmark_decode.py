@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Benchmark full-resolution decoding against reduced-resolution decoding.
+
+Builds large JPEG and PNG test files from a sample photo, then compares plain
+Image.open().convert('RGB') with DiseaseAnalyzer._open_image at the working
+resolution: decode time (in-process, best of N) and its speedup over the
+full decode, peak RSS (fresh process per measurement), plus the end-to-end
+rule-based analyze_image time.
+
+Usage: python benchmark_decode.py [--resolution 1024] [--repeats 5]
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from PIL import Image
+from analysis import DiseaseAnalyzer
+
+SOURCE_IMAGE = 'xyz/diseased_plant_leave_3c47ab27.jpg'
+SIZES = [
+    ('4K', (3840, 2160)),
+    ('12MP', (4000, 3000)),
+]
+
+RSS_PROBE = r'''
+import sys, logging
+logging.disable(logging.CRITICAL)
+from analysis import DiseaseAnalyzer
+
+def vm(field):
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith(field + ':'):
+                return int(line.split()[1])
+
+analyzer = DiseaseAnalyzer(load_model=False, working_resolution=int(sys.argv[2]) or None)
+before = vm('VmRSS')
+img = analyzer._open_image(sys.argv[1])
+print(before, vm('VmHWM'))
+'''
+
+
+def best_time(fn, repeats):
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings) * 1000
+
+
+def peak_rss_mb(path, resolution):
+    """(peak RSS, peak above the pre-decode baseline) in MB for one decode in a fresh process."""
+    before, peak = map(int, subprocess.run(
+        [sys.executable, '-c', RSS_PROBE, path, str(resolution or 0)],
+        capture_output=True, text=True, check=True
+    ).stdout.split())
+    return peak / 1024, (peak - before) / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare full and reduced-resolution decoding.')
+    parser.add_argument('--resolution', type=int, default=DiseaseAnalyzer.WORKING_RESOLUTION)
+    parser.add_argument('--repeats', type=int, default=5)
+    args = parser.parse_args()
+    
+    # Rule-based timings only; the CNN cost does not depend on decode size
+    full = DiseaseAnalyzer(load_model=False, working_resolution=None)
+    reduced = DiseaseAnalyzer(load_model=False, working_resolution=args.resolution)
+    
+    source = Image.open(SOURCE_IMAGE).convert('RGB')
+    
+    print("=" * 110)
+    print(f"DECODE BENCHMARK: full resolution vs working resolution {args.resolution}px")
+    print("=" * 110)
+    print(f"{'Input':<12} {'Mode':<9} {'Decoded size':>13} {'Decode (ms)':>12} {'Speedup':>8} {'Peak RSS (MB)':>14} "
+          f"{'Decode RSS (MB)':>16} {'analyze_image (ms)':>19}")
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        for label, size in SIZES:
+            base = source.resize(size)
+            for extension, options in (('jpg', {'quality': 90}), ('png', {})):
+                path = os.path.join(tmp, f"{label}.{extension}")
+                base.save(path, **options)
+                
+                full_decode_ms = None
+                for mode, analyzer in (('full', full), ('reduced', reduced)):
+                    decoded = analyzer._open_image(path)
+                    decode_ms = best_time(lambda: analyzer._open_image(path), args.repeats)
+                    full_decode_ms = full_decode_ms or decode_ms
+                    analyze_ms = best_time(lambda: analyzer.analyze_image(path), args.repeats)
+                    peak, delta = peak_rss_mb(path, analyzer.working_resolution)
+                    print(f"{label + ' ' + extension.upper():<12} {mode:<9} {'%dx%d' % decoded.size:>13} "
+                          f"{decode_ms:>12.1f} {full_decode_ms / decode_ms:>7.1f}x {peak:>14.1f} {delta:>16.1f} "
+                          f"{analyze_ms:>19.1f}")
+
+
+if __name__ == '__main__':
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    main()
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Benchmark the fused feature kernel against the previous per-feature analysis.
+
+The legacy path ran _analyze_colors and _detect_spots twice and _analyze_texture
+once per rule-based request, each with its own copies of the pixel data.
+"""
+import os
+import time
+import numpy as np
+from PIL import Image, ImageStat
+from analysis import DiseaseAnalyzer
+
+SOURCE_IMAGE = 'xyz/diseased_plant_leave_3c47ab27.jpg'
+SIZES = [
+    (400, 300),
+    (1280, 853),
+    (1920, 1080),
+    (3840, 2160),
+    (4000, 3000),   # 12 MP phone photo
+]
+REPEATS = 5
+
+
+def legacy_colors(img):
+    pixels = np.array(img)
+    height, width, _ = pixels.shape
+    total_pixels = height * width
+    r = pixels[:, :, 0].flatten()
+    g = pixels[:, :, 1].flatten()
+    b = pixels[:, :, 2].flatten()
+    green_percentage = np.sum((g > r) & (g > b) & (g > 50)) / total_pixels * 100
+    brown_percentage = np.sum((r > 80) & (r < 220) & (g > 40) & (g < 180) & (b < 120) & (r > b)) / total_pixels * 100
+    yellow_percentage = np.sum((r > 120) & (g > 120) & (b < 120) & (r > b) & (g > b)) / total_pixels * 100
+    health_score = green_percentage - (brown_percentage + yellow_percentage * 0.7)
+    return {
+        'green_percentage': round(green_percentage, 2),
+        'brown_percentage': round(brown_percentage, 2),
+        'yellow_percentage': round(yellow_percentage, 2),
+        'health_score': round(health_score, 2)
+    }
+
+
+def legacy_spots(img):
+    pixels = np.array(img.convert('L'))
+    threshold = np.mean(pixels) - (np.std(pixels) * 0.8)
+    spot_count = np.sum(pixels < threshold) / pixels.size * 100
+    return {'spot_count': round(spot_count, 2), 'has_significant_spots': spot_count > 8}
+
+
+def legacy_texture(img):
+    variance = ImageStat.Stat(img.convert('L')).var[0]
+    return {'texture_variance': variance, 'is_uniform': variance < 500}
+
+
+def legacy_features(img):
+    legacy_colors(img)
+    legacy_spots(img)
+    texture = legacy_texture(img)
+    return legacy_colors(img), legacy_spots(img), texture
+
+
+def best_time(fn, img):
+    timings = []
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        fn(img)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    analyzer = DiseaseAnalyzer(load_model=False, working_resolution=None)
+    source = Image.open(SOURCE_IMAGE).convert('RGB')
+    
+    print("=" * 80)
+    print("FEATURE EXTRACTION BENCHMARK (best of %d runs)" % REPEATS)
+    print("=" * 80)
+    print(f"{'Size':>12} {'Megapixels':>11} {'Legacy (ms)':>12} {'Fused (ms)':>11} {'Speedup':>8}  Match")
+    
+    for width, height in SIZES:
+        img = source.resize((width, height))
+        
+        legacy = legacy_features(img)
+        fused = analyzer._extract_features(img)
+        match = (
+            legacy[0] == fused[0] and
+            legacy[1] == fused[1] and
+            abs(legacy[2]['texture_variance'] - fused[2]['texture_variance']) < 1e-6
+        )
+        
+        legacy_time = best_time(legacy_features, img)
+        fused_time = best_time(analyzer._extract_features, img)
+        
+        print(f"{width:>5}x{height:<6} {width * height / 1e6:>11.1f} {legacy_time * 1000:>12.1f} "
+              f"{fused_time * 1000:>11.1f} {legacy_time / fused_time:>7.1f}x  {'yes' if match else 'NO'}")
+
+
+if __name__ == '__main__':
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    main()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Benchmark /history latency as a user's analysis count grows.
+
+Uses the Flask test client against a throwaway SQLite database. The demo
+user's history is grown to each size in turn. Each size reports:
+- the time to load every row the way /history used to (one unpaginated
+  query);
+- the full /history response time for the first page;
+- the full /history response time for a page halfway back, reached by
+  keyset cursor;
+- the uncached summary-count query, which /history serves from a short
+  cache (HISTORY_STATS_TTL).
+The database is removed afterwards.
+
+Usage: python benchmark_history.py [--sizes 100,1000,10000,100000] [--repeats 20]
+"""
+import argparse
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+
+def best_ms(fn, repeats):
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure /history latency from 100 to 100k rows.')
+    parser.add_argument('--sizes', default='100,1000,10000,100000')
+    parser.add_argument('--repeats', type=int, default=20)
+    args = parser.parse_args()
+    sizes = [int(size) for size in args.sizes.split(',')]
+
+    database = os.path.join(tempfile.mkdtemp(), 'benchmark.db')
+    os.environ['DATABASE_URL'] = f"sqlite:///{database}"
+    os.environ['ASYNC_ANALYSIS'] = '0'
+    os.environ.setdefault('SESSION_SECRET', 'benchmark')
+
+    import logging
+    from sqlalchemy import insert, text
+    from app import app, db, encode_cursor
+    from analysis import DiseaseAnalyzer
+    from models import Analysis, User
+    logging.disable(logging.CRITICAL)
+
+    client = app.test_client()
+    client.post('/login', data={'username_or_email': 'demo', 'password': 'demo123'})
+
+    results = []
+    try:
+        with app.app_context():
+            user_id = User.query.filter_by(username='demo').one().id
+            info = DiseaseAnalyzer.DISEASE_DATABASE
+            start_time = datetime(2024, 1, 1)
+            rows = 0
+
+            for size in sizes:
+                batch = []
+                for i in range(rows, size):
+                    key = 'healthy' if i % 3 else 'diseased'
+                    batch.append({
+                        'user_id': user_id,
+                        'image_filename': f"{i:06d}_leaf.jpg",
+                        'disease_detected': info[key]['name'],
+                        'confidence': 90.0,
+                        'severity': 'None' if key == 'healthy' else 'Medium',
+                        'disease_key': key,
+                        'created_at': start_time + timedelta(minutes=i),
+                        'status': 'complete',
+                    })
+                db.session.execute(insert(Analysis), batch)
+                db.session.commit()
+                rows = size
+
+                def full_query():
+                    Analysis.query.filter_by(user_id=user_id).order_by(Analysis.created_at.desc()).all()
+                    db.session.expunge_all()
+
+                middle = Analysis.query.filter_by(user_id=user_id).order_by(
+                    Analysis.created_at.desc(), Analysis.id.desc()).offset(size // 2).first()
+                deep_url = f"/history?before={encode_cursor(middle)}"
+
+                full_ms = best_ms(full_query, max(1, args.repeats // 5))
+                stats_ms = best_ms(lambda: Analysis.history_stats(user_id), args.repeats)
+                first_ms = best_ms(lambda: client.get('/history'), args.repeats)
+                deep_ms = best_ms(lambda: client.get(deep_url), args.repeats)
+                results.append((size, full_ms, first_ms, deep_ms, stats_ms))
+                print(f"  {size} rows measured")
+
+            plan = db.session.execute(text(
+                "EXPLAIN QUERY PLAN SELECT id FROM analysis WHERE user_id = :user "
+                "AND (created_at, id) < (:created, :id) ORDER BY created_at DESC, id DESC LIMIT 21"
+            ), {'user': user_id, 'created': middle.created_at, 'id': middle.id}).fetchall()
+    finally:
+        with app.app_context():
+            db.drop_all()
+        os.remove(database)
+
+    print("\n" + "=" * 82)
+    print("HISTORY PAGE LATENCY")
+    print("=" * 82)
+    print(f"{'Rows':>8} {'Old: load all (ms)':>20} {'First page (ms)':>17} {'Deep page (ms)':>16} {'Counts (ms)':>13}")
+    for size, full_ms, first_ms, deep_ms, stats_ms in results:
+        print(f"{size:>8} {full_ms:>20.1f} {first_ms:>17.1f} {deep_ms:>16.1f} {stats_ms:>13.1f}")
+    print("=" * 82)
+    print("Page query plan: " + '; '.join(row[-1] for row in plan))
+
+
+if __name__ == '__main__':
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    main()
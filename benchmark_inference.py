@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Compare per-call latency of model.predict against the compiled inference path.
+
+Usage: python benchmark_inference.py [--xla] [--repeats N]
+"""
+import argparse
+import os
+import time
+import numpy as np
+from analysis import DiseaseAnalyzer
+
+BATCH_SIZES = [1, 4, 16, 32]
+
+
+def median_ms(fn, batch, repeats):
+    fn(batch)  # warm-up for this batch shape
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn(batch)
+        timings.append(time.perf_counter() - start)
+    return float(np.median(timings)) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--xla', action='store_true', help='benchmark the XLA-compiled variant')
+    parser.add_argument('--repeats', type=int, default=50)
+    args = parser.parse_args()
+    
+    analyzer = DiseaseAnalyzer(compiled_inference=True, jit_compile=args.xla)
+    if not analyzer.model_loaded:
+        print(f"Model not available at {analyzer.model_path}; nothing to benchmark")
+        return
+    if analyzer._infer is None:
+        print("Compiled inference failed to build; see log output")
+        return
+    
+    size = analyzer.MODEL_INPUT_SIZE
+    predict = lambda batch: analyzer.model.predict(batch, batch_size=len(batch), verbose=0)
+    compiled = lambda batch: np.asarray(analyzer._infer(batch))
+    
+    print("=" * 80)
+    print(f"INFERENCE LATENCY: model.predict vs {'XLA' if args.xla else 'traced'} function "
+          f"(median of {args.repeats})")
+    print("=" * 80)
+    print(f"{'Batch':>6} {'predict (ms)':>13} {'compiled (ms)':>14} {'Speedup':>8} {'Max |diff|':>11}")
+    
+    rng = np.random.default_rng(0)
+    for batch_size in BATCH_SIZES:
+        batch = rng.random((batch_size, size, size, 3), dtype=np.float32)
+        max_diff = float(np.max(np.abs(predict(batch) - compiled(batch))))
+        
+        predict_ms = median_ms(predict, batch, args.repeats)
+        compiled_ms = median_ms(compiled, batch, args.repeats)
+        print(f"{batch_size:>6} {predict_ms:>13.2f} {compiled_ms:>14.2f} "
+              f"{predict_ms / compiled_ms:>7.1f}x {max_diff:>11.2e}")
+
+
+if __name__ == '__main__':
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    main()
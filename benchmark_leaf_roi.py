@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Benchmark leaf bounding-box detection in _preprocess_for_leaves.
+
+Compares the original approach (copy the RGB buffer, rebuild the green mask,
+np.argwhere over every green pixel) with the current one (row/column
+projections of a strided view of the mask already computed by the colour
+analysis). Images are analysed at full resolution, so the mask has one entry
+per pixel. Reports best-of-N time and tracemalloc peak for each, and checks
+that both boxes agree within the crop padding.
+
+Usage: python benchmark_leaf_roi.py [--repeats 5]
+"""
+import argparse
+import os
+import time
+import tracemalloc
+import numpy as np
+from PIL import Image
+from analysis import DiseaseAnalyzer
+
+SOURCE_IMAGE = 'xyz/diseased_plant_leave_3c47ab27.jpg'
+SIZES = [
+    ('4K', (3840, 2160)),
+    ('12MP', (4000, 3000)),
+]
+
+
+def legacy_bbox(img):
+    """The original argwhere-based detection, including its own mask."""
+    img_array = np.array(img)
+    r = img_array[:, :, 0]
+    g = img_array[:, :, 1]
+    b = img_array[:, :, 2]
+    green_mask = (g > r) & (g > b) & (g > 50)
+    coords = np.argwhere(green_mask)
+    y_min, x_min = coords.min(axis=0)
+    y_max, x_max = coords.max(axis=0)
+    return int(x_min), int(y_min), int(x_max) + 1, int(y_max) + 1
+
+
+def measure(func, repeats):
+    """(best time in ms, tracemalloc peak in MB, last return value)."""
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best * 1000, peak / 1e6, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark leaf bounding-box detection.')
+    parser.add_argument('--repeats', type=int, default=5)
+    args = parser.parse_args()
+
+    analyzer = DiseaseAnalyzer(load_model=False, working_resolution=None)
+
+    source = Image.open(SOURCE_IMAGE).convert('RGB')
+
+    print("=" * 92)
+    print("LEAF BOUNDING BOX: argwhere vs strided projections")
+    print("=" * 92)
+    print(f"{'Size':<6} {'Method':<36} {'Time (ms)':>10} {'Peak (MB)':>10} {'Box':>26}")
+
+    for name, size in SIZES:
+        img = source.resize(size, Image.Resampling.BILINEAR)
+        _, green_mask = analyzer._extract_features_and_mask(img)
+
+        legacy_ms, legacy_mb, legacy_box = measure(lambda: legacy_bbox(img), args.repeats)
+        shared_ms, shared_mb, shared_box = measure(lambda: analyzer._leaf_bbox(green_mask, img.size), args.repeats)
+        own_ms, own_mb, _ = measure(lambda: analyzer._leaf_bbox(analyzer._green_mask(img), img.size), args.repeats)
+
+        print(f"{name:<6} {'argwhere (original)':<36} {legacy_ms:>10.2f} {legacy_mb:>10.1f} {str(legacy_box):>26}")
+        print(f"{'':<6} {'projections, shared mask':<36} {shared_ms:>10.2f} {shared_mb:>10.1f} {str(shared_box):>26}")
+        print(f"{'':<6} {'projections, own mask':<36} {own_ms:>10.2f} {own_mb:>10.1f}")
+
+        padding = 0.1 * min(legacy_box[2] - legacy_box[0], legacy_box[3] - legacy_box[1])
+        error = max(abs(a - b) for a, b in zip(legacy_box, shared_box))
+        status = 'within' if error <= padding else 'OUTSIDE'
+        print(f"{'':<6} max edge difference {error}px ({status} the {padding:.0f}px crop padding)")
+
+    print("=" * 92)
+
+
+if __name__ == '__main__':
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    main()
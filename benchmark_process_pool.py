@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Benchmark analysis throughput with threads versus the process pool.
+
+Runs the same set of images through DiseaseAnalyzer.analyze_image on a
+thread pool and through AnalysisPool (shared-memory transfer, one warm
+analyzer per process) for each worker count, and reports images/second
+plus scaling efficiency relative to one worker. Results from both paths
+are checked against a serial run.
+
+Without a model file the rule-based path is measured; with one, every
+worker process loads its own copy.
+
+Usage: python benchmark_process_pool.py [--workers 1 2 4] [--images 64] [--working-resolution 1024]
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from analysis import DiseaseAnalyzer
+from analysis_pool import AnalysisPool
+
+DIRECTORIES = ['xyz', 'test_images']
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+
+
+def collect_images(count):
+    paths = []
+    for directory in DIRECTORIES:
+        for root, _, files in os.walk(directory):
+            paths.extend(os.path.join(root, f) for f in sorted(files) if f.lower().endswith(IMAGE_EXTENSIONS))
+    return (paths * (count // max(1, len(paths)) + 1))[:count]
+
+
+def default_worker_counts():
+    counts = [1]
+    while counts[-1] * 2 <= (os.cpu_count() or 1):
+        counts.append(counts[-1] * 2)
+    if counts[-1] != os.cpu_count():
+        counts.append(os.cpu_count() or 1)
+    return counts
+
+
+def run_threads(analyzer, paths, workers):
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        start = time.perf_counter()
+        results = list(pool.map(analyzer.analyze_image, paths))
+        return results, time.perf_counter() - start
+
+
+def run_processes(analyzer, analyzer_kwargs, paths, workers):
+    pool = AnalysisPool(analyzer, max_workers=workers, analyzer_kwargs=analyzer_kwargs)
+    try:
+        pool.wait_until_ready()
+        # One untimed round so every process has imported and warmed up
+        for future in [pool.submit(path) for path in paths[:workers * 2]]:
+            future.result()
+
+        # Keep submitting from a few threads, as concurrent requests would
+        with ThreadPoolExecutor(max_workers=workers) as submitters:
+            start = time.perf_counter()
+            results = list(submitters.map(pool.analyze_image, paths))
+            return results, time.perf_counter() - start
+    finally:
+        pool.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare thread and process-pool analysis throughput.')
+    parser.add_argument('--workers', type=int, nargs='+', default=default_worker_counts())
+    parser.add_argument('--images', type=int, default=64)
+    parser.add_argument('--working-resolution', type=int, default=DiseaseAnalyzer.WORKING_RESOLUTION,
+                        help='decode resolution (0 = full resolution)')
+    args = parser.parse_args()
+
+    analyzer_kwargs = {'working_resolution': args.working_resolution or None}
+    analyzer = DiseaseAnalyzer(**analyzer_kwargs)
+    paths = collect_images(args.images)
+    print(f"{len(paths)} images, {os.cpu_count()} CPUs, model {analyzer.model_state}")
+
+    expected = [analyzer.analyze_image(path) for path in paths]
+
+    print("\n" + "=" * 78)
+    print("ANALYSIS THROUGHPUT: threads vs process pool")
+    print("=" * 78)
+    print(f"{'Workers':>8} {'Threads img/s':>14} {'scaling':>8} {'Processes img/s':>16} {'scaling':>8} {'match':>7}")
+
+    thread_base = None
+    process_base = None
+    for workers in args.workers:
+        thread_results, thread_time = run_threads(analyzer, paths, workers)
+        process_results, process_time = run_processes(analyzer, analyzer_kwargs, paths, workers)
+
+        thread_rate = len(paths) / thread_time
+        process_rate = len(paths) / process_time
+        thread_base = thread_base or thread_rate
+        process_base = process_base or process_rate
+        match = thread_results == expected and process_results == expected
+
+        print(f"{workers:>8} {thread_rate:>14.1f} {thread_rate / thread_base / workers:>7.0%} "
+              f"{process_rate:>16.1f} {process_rate / process_base / workers:>7.0%} {'yes' if match else 'NO':>7}")
+
+    print("=" * 78)
+    print("Scaling is throughput per worker relative to one worker (100% = linear).")
+
+
+if __name__ == '__main__':
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    main()
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Measure cold start of the Flask app with blocking vs background model loading.
+
+Each run starts a fresh interpreter, imports app.py and reports how long until
+the login page can be served and how long until the model is ready.
+
+Usage: python benchmark_startup.py [--runs 3]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+PROBE = r'''
+import time
+start = time.perf_counter()
+import json, logging
+logging.disable(logging.CRITICAL)
+from app import app, disease_analyzer
+imported = time.perf_counter() - start
+response = app.test_client().get('/login')
+first_page = time.perf_counter() - start
+ready_status = app.test_client().get('/ready').status_code
+disease_analyzer.wait_for_model()
+model_ready = time.perf_counter() - start
+print(json.dumps({
+    'import': imported,
+    'first_page': first_page,
+    'first_page_status': response.status_code,
+    'ready_status_at_first_page': ready_status,
+    'model_ready': model_ready,
+    'model_state': disease_analyzer.model_state,
+}))
+'''
+
+
+def run_probe(background, database_path):
+    env = dict(os.environ)
+    env.setdefault('SESSION_SECRET', 'benchmark')
+    env['DATABASE_URL'] = f"sqlite:///{database_path}"
+    env['MODEL_BACKGROUND_LOAD'] = '1' if background else '0'
+    env['TF_CPP_MIN_LOG_LEVEL'] = '3'
+    output = subprocess.run(
+        [sys.executable, '-c', PROBE], env=env, capture_output=True, text=True, check=True
+    ).stdout.strip().splitlines()
+    return json.loads(output[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure cold start with and without background model loading.')
+    parser.add_argument('--runs', type=int, default=3)
+    args = parser.parse_args()
+    
+    print("=" * 80)
+    print(f"COLD START (median of {args.runs} fresh processes)")
+    print("=" * 80)
+    print(f"{'Mode':<12} {'import (s)':>11} {'first page (s)':>15} {'/ready then':>12} {'model ready (s)':>16}  state")
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        for background in (False, True):
+            runs = [run_probe(background, os.path.join(tmp, f"startup_{background}_{i}.db")) for i in range(args.runs)]
+            median = lambda key: sorted(r[key] for r in runs)[len(runs) // 2]
+            print(f"{'background' if background else 'blocking':<12} {median('import'):>11.2f} "
+                  f"{median('first_page'):>15.2f} {runs[0]['ready_status_at_first_page']:>12} "
+                  f"{median('model_ready'):>16.2f}  {runs[0]['model_state']}")
+
+
+if __name__ == '__main__':
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    main()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Benchmark history page image weight with and without thumbnails.
+
+Uses the Flask test client against a throwaway SQLite database and
+thumbnail directory. One history page is filled with analyses of images
+from xyz/. The script then measures the bytes the browser downloads for
+that page's images: full-size originals (the old <img src>) against the
+thumbnails the page now requests. It also reports the time to fetch the
+page's images with the thumbnail cache cold and then warm. Everything
+created is removed afterwards.
+
+Usage: python benchmark_thumbnails.py [--images 20]
+"""
+import argparse
+import os
+import re
+import shutil
+import tempfile
+import time
+
+IMAGE_DIRECTORY = 'xyz'
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare history page image weight with and without thumbnails.')
+    parser.add_argument('--images', type=int, default=20)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(workdir, 'benchmark.db')}"
+    os.environ['THUMBNAIL_DIR'] = os.path.join(workdir, 'thumbnails')
+    os.environ['HISTORY_PAGE_SIZE'] = str(args.images)
+    os.environ['ASYNC_ANALYSIS'] = '0'
+    os.environ.setdefault('SESSION_SECRET', 'benchmark')
+
+    import logging
+    from app import app, db
+    from models import Analysis, User
+    logging.disable(logging.CRITICAL)
+
+    names = sorted(f for f in os.listdir(IMAGE_DIRECTORY) if f.lower().endswith(IMAGE_EXTENSIONS))[:args.images]
+    copies = []
+    try:
+        with app.app_context():
+            user_id = User.query.filter_by(username='demo').one().id
+            for i, name in enumerate(names):
+                filename = f"benchmark_{i:04d}_{name}"
+                shutil.copyfile(os.path.join(IMAGE_DIRECTORY, name), os.path.join(app.config['UPLOAD_FOLDER'], filename))
+                copies.append(filename)
+                db.session.add(Analysis(
+                    user_id=user_id, image_filename=filename, disease_detected='Healthy Plant',
+                    confidence=90.0, severity='None', disease_key='healthy'
+                ))
+            db.session.commit()
+
+        client = app.test_client()
+        client.post('/login', data={'username_or_email': 'demo', 'password': 'demo123'})
+        page = client.get('/history').get_data(as_text=True)
+        thumb_urls = re.findall(r'<img src="(/thumbs/[^"]+)"', page)
+
+        original_bytes = 0
+        for filename in copies:
+            original_bytes += len(client.get(f"/uploads/{filename}").data)
+
+        def fetch_thumbnails():
+            total = 0
+            for url in thumb_urls:
+                response = client.get(url)
+                assert response.status_code == 200, url
+                total += len(response.data)
+            return total
+
+        start = time.perf_counter()
+        thumb_bytes = fetch_thumbnails()
+        cold = time.perf_counter() - start
+        start = time.perf_counter()
+        fetch_thumbnails()
+        warm = time.perf_counter() - start
+    finally:
+        with app.app_context():
+            db.drop_all()
+        for filename in copies:
+            os.remove(os.path.join(app.config['UPLOAD_FOLDER'], filename))
+        shutil.rmtree(workdir)
+
+    print("\n" + "=" * 60)
+    print(f"HISTORY PAGE IMAGES ({len(thumb_urls)} per page)")
+    print("=" * 60)
+    print(f"Originals:   {original_bytes / 1024:>10.1f} KB")
+    print(f"Thumbnails:  {thumb_bytes / 1024:>10.1f} KB ({original_bytes / max(1, thumb_bytes):.0f}x smaller)")
+    print(f"Thumbnail fetch, cold cache: {cold * 1000:>7.1f} ms ({cold * 1000 / len(thumb_urls):.1f} ms/image)")
+    print(f"Thumbnail fetch, warm cache: {warm * 1000:>7.1f} ms ({warm * 1000 / len(thumb_urls):.1f} ms/image)")
+    print("=" * 60)
+
+
+if __name__ == '__main__':
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    main()
@@ -31,10 +31,13 @@ def test_images():
     
     if os.path.exists(diseased_dir):
         diseased_files = [f for f in os.listdir(diseased_dir) if f.endswith(('.jpg', '.jpeg', '.png'))]
-        for i, filename in enumerate(diseased_files, 1):
-            filepath = os.path.join(diseased_dir, filename)
+        results = analyzer.analyze_batch(
+            [os.path.join(diseased_dir, f) for f in diseased_files], return_exceptions=True
+        )
+        for i, (filename, result) in enumerate(zip(diseased_files, results), 1):
             try:
-                result = analyzer.analyze_image(filepath)
+                if isinstance(result, Exception):
+                    raise result
                 detected = result['disease']
                 confidence = result['confidence']
                 severity = result['severity']
@@ -63,10 +66,13 @@ def test_images():
     
     if os.path.exists(healthy_dir):
         healthy_files = [f for f in os.listdir(healthy_dir) if f.endswith(('.jpg', '.jpeg', '.png'))]
-        for i, filename in enumerate(healthy_files, 1):
-            filepath = os.path.join(healthy_dir, filename)
+        results = analyzer.analyze_batch(
+            [os.path.join(healthy_dir, f) for f in healthy_files], return_exceptions=True
+        )
+        for i, (filename, result) in enumerate(zip(healthy_files, results), 1):
             try:
-                result = analyzer.analyze_image(filepath)
+                if isinstance(result, Exception):
+                    raise result
                 detected = result['disease']
                 confidence = result['confidence']
                 ml_powered = result['analysis_details']['ml_powered']
@@ -94,10 +100,13 @@ def test_images():
     
     if os.path.exists(xyz_dir):
         xyz_files = sorted([f for f in os.listdir(xyz_dir) if f.endswith(('.jpg', '.jpeg', '.png'))])[:20]  # Test first 20
-        for i, filename in enumerate(xyz_files, 1):
-            filepath = os.path.join(xyz_dir, filename)
+        results = analyzer.analyze_batch(
+            [os.path.join(xyz_dir, f) for f in xyz_files], return_exceptions=True
+        )
+        for i, (filename, result) in enumerate(zip(xyz_files, results), 1):
             try:
-                result = analyzer.analyze_image(filepath)
+                if isinstance(result, Exception):
+                    raise result
                 detected = result['disease']
                 confidence = result['confidence']
                 severity = result['severity']
@@ -4,6 +4,7 @@ Create a detailed summary of the current state and all fixes applied
 """
 import os
 from datetime import datetime
+from storage import BlobStore
 
 print("="*80)
 print("PLANT DISEASE DETECTION - COMPREHENSIVE STATUS REPORT")
@@ -40,14 +41,16 @@ print(f"  - Healthy: {xyz_healthy}")
 print(f"  - Diseased: {xyz_diseased}")
 print(f"  - Total: {len(xyz_files)}")
 
-# Check recent uploads
-uploads = sorted([f for f in os.listdir('uploads') if f.endswith(('.jpg', '.png', '.jpeg'))], 
-                 key=lambda x: os.path.getmtime(os.path.join('uploads', x)), reverse=True)
+# Check recent uploads: flat files from before the content-addressed store, plus its blobs
+uploads = [(f, os.path.getmtime(os.path.join('uploads', f))) for f in os.listdir('uploads')
+           if f.endswith(('.jpg', '.png', '.jpeg')) and not f.startswith('heatmap_')]
+uploads += [(digest[:12], mtime) for digest, _, mtime in BlobStore('uploads').iter_blobs()]
+uploads.sort(key=lambda x: x[1], reverse=True)
 print(f"\n✓ Recent Uploads:")
 print(f"  - Total uploads: {len(uploads)}")
 if len(uploads) > 0:
-    latest = uploads[0]
-    latest_time = datetime.fromtimestamp(os.path.getmtime(os.path.join('uploads', latest)))
+    latest, latest_mtime = uploads[0]
+    latest_time = datetime.fromtimestamp(latest_mtime)
     print(f"  - Latest: {latest}")
     print(f"  - Time: {latest_time.strftime('%Y-%m-%d %H:%M:%S')}")
 
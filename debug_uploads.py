@@ -4,27 +4,37 @@ Debug recent uploads to see what predictions were made
 """
 import os
 from analysis import DiseaseAnalyzer
+from models import create_db_app, Analysis
+from storage import BlobStore
 
 # Initialize analyzer
 analyzer = DiseaseAnalyzer()
 print(f"Model loaded: {analyzer.model_loaded}\n")
 
-# Get recent uploads
+# Get recent uploads: content-addressed blobs have no name or extension, so
+# they are found through the analyses that refer to them
 uploads_dir = 'uploads'
-recent_files = sorted(
-    [(f, os.path.getmtime(os.path.join(uploads_dir, f))) 
-     for f in os.listdir(uploads_dir) if f.endswith(('.jpg', '.png', '.jpeg'))],
-    key=lambda x: x[1],
-    reverse=True
-)[:10]
+blob_store = BlobStore(uploads_dir)
+recent_files = []
+seen = set()
+with create_db_app().app_context():
+    for analysis in Analysis.query.order_by(Analysis.created_at.desc(), Analysis.id.desc()).yield_per(100):
+        if analysis.image_sha256:
+            filepath = blob_store.path(analysis.image_sha256)
+        else:
+            filepath = os.path.join(uploads_dir, analysis.image_filename)
+        if filepath in seen or not os.path.isfile(filepath):
+            continue
+        seen.add(filepath)
+        recent_files.append((analysis.image_filename, filepath))
+        if len(recent_files) == 10:
+            break
 
 print("="*80)
 print("ANALYZING RECENT UPLOADS")
 print("="*80)
 
-for filename, _ in recent_files:
-    filepath = os.path.join(uploads_dir, filename)
-    
+for filename, filepath in recent_files:
     # Extract expected label from filename if possible
     expected = None
     if 'healthy' in filename.lower():
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Quantify the error of approximate (pixel-budget) rule-based analysis.
+
+Every image in test_images/, xyz/ and uploads/ (flat files and stored
+blobs) is analysed once exactly at full resolution and then at each pixel
+budget. For each budget the report shows mean and max absolute error of the
+green/brown/yellow/spot percentages, mean relative error of the texture
+variance, how often the rule-based verdict and severity still match, and the
+time per image.
+
+Usage: python evaluate_approximate_mode.py [--budgets 16384 65536 262144] [--working-resolution 0]
+"""
+import argparse
+import os
+import time
+import numpy as np
+from PIL import Image
+from analysis import DiseaseAnalyzer
+from storage import BlobStore
+
+DIRECTORIES = ['test_images', 'xyz', 'uploads']
+UPLOAD_FOLDER = 'uploads'
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+PERCENTAGES = [
+    ('green', 0, 'green_percentage'),
+    ('brown', 0, 'brown_percentage'),
+    ('yellow', 0, 'yellow_percentage'),
+    ('spots', 1, 'spot_count'),
+]
+
+
+def collect_images():
+    paths = []
+    for directory in DIRECTORIES:
+        for root, _, files in os.walk(directory):
+            paths.extend(os.path.join(root, f) for f in sorted(files)
+                         if f.lower().endswith(IMAGE_EXTENSIONS) and not f.startswith('heatmap_'))
+    # Uploads in the content-addressed store are extensionless blobs
+    store = BlobStore(UPLOAD_FOLDER)
+    paths.extend(store.path(digest) for digest, _, _ in sorted(store.iter_blobs()))
+    return paths
+
+
+def rule_based(analyzer, img):
+    """Features, verdict and seconds spent for one decoded image."""
+    start = time.perf_counter()
+    features = analyzer._extract_features(img)
+    verdict = analyzer._determine_disease(*features)
+    return features, verdict, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure approximate-mode error against exact analysis.')
+    parser.add_argument('--budgets', type=int, nargs='+', default=[4096, 16384, 65536, 262144])
+    parser.add_argument('--working-resolution', type=int, default=0,
+                        help='decode resolution for every run (0 = full resolution)')
+    args = parser.parse_args()
+
+    exact = DiseaseAnalyzer(load_model=False, working_resolution=args.working_resolution or None)
+
+    images = []
+    skipped = []
+    for path in collect_images():
+        # The upload store also keeps the bytes of uploads that failed to decode
+        try:
+            images.append(exact._open_image(path))
+        except (OSError, ValueError, Image.DecompressionBombError) as e:
+            skipped.append((path, e))
+    print(f"Loaded {len(images)} images from {', '.join(DIRECTORIES)}")
+    if skipped:
+        print(f"Skipped {len(skipped)} files that could not be decoded:")
+        for path, error in skipped:
+            print(f"  {path}: {error}")
+
+    reference = [rule_based(exact, img) for img in images]
+    exact_ms = np.mean([seconds for _, _, seconds in reference]) * 1000
+
+    print("\n" + "=" * 110)
+    print("APPROXIMATE MODE ERROR vs EXACT FULL-RESOLUTION ANALYSIS")
+    print("=" * 110)
+    header = f"{'Budget':>9}"
+    for name, _, _ in PERCENTAGES:
+        header += f" {name + ' mean/max':>17}"
+    header += f" {'texture rel':>12} {'verdict':>8} {'severity':>9} {'ms/img':>7}"
+    print(header)
+    print(f"{'exact':>9}" + f" {'0.00 / 0.00':>17}" * len(PERCENTAGES) + f" {'0.0%':>12} {'100.0%':>8} {'100.0%':>9} {exact_ms:>7.2f}")
+
+    for budget in args.budgets:
+        approx = DiseaseAnalyzer(load_model=False, working_resolution=exact.working_resolution, pixel_budget=budget)
+        runs = [rule_based(approx, img) for img in images]
+
+        row = f"{budget:>9}"
+        for _, part, key in PERCENTAGES:
+            errors = np.array([abs(run[0][part][key] - ref[0][part][key]) for run, ref in zip(runs, reference)])
+            row += f" {errors.mean():>7.2f} / {errors.max():>5.2f}"
+
+        texture = np.mean([
+            abs(run[0][2]['texture_variance'] - ref[0][2]['texture_variance']) / max(ref[0][2]['texture_variance'], 1e-9)
+            for run, ref in zip(runs, reference)
+        ]) * 100
+        verdict = np.mean([run[1][0] == ref[1][0] for run, ref in zip(runs, reference)]) * 100
+        severity = np.mean([run[1][2] == ref[1][2] for run, ref in zip(runs, reference)]) * 100
+        approx_ms = np.mean([seconds for _, _, seconds in runs]) * 1000
+        print(row + f" {texture:>11.2f}% {verdict:>7.1f}% {severity:>8.1f}% {approx_ms:>7.2f}")
+
+    print("=" * 110)
+    print("Percentages are absolute percentage points; verdict/severity are agreement rates with exact mode.")
+
+
+if __name__ == '__main__':
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    main()
@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""
+Export the Keras model to quantized TFLite and compare it against the original.
+
+Writes models/plant_disease_model_dynamic.tflite (dynamic-range weights) and
+models/plant_disease_model_int8.tflite (full integer, calibrated on images
+from training_data/), then reports accuracy on test_images/ and xyz/ next to
+per-image latency, file size and peak RSS for each backend.
+
+Serve the result with ANALYZER_BACKEND=tflite (and TFLITE_MODEL_PATH /
+TFLITE_THREADS to pick the file and thread count).
+
+Usage: python export_tflite.py [--modes dynamic int8] [--calibration-samples 200] [--threads 4]
+"""
+import argparse
+import os
+import resource
+import subprocess
+import sys
+import time
+import numpy as np
+from analysis import DiseaseAnalyzer
+
+OUTPUT_PATHS = {
+    'dynamic': 'models/plant_disease_model_dynamic.tflite',
+    'int8': 'models/plant_disease_model_int8.tflite',
+}
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+
+
+def list_images(directory):
+    if not os.path.isdir(directory):
+        return []
+    return sorted(os.path.join(directory, f) for f in os.listdir(directory) if f.lower().endswith(IMAGE_EXTENSIONS))
+
+
+def labelled_sets():
+    """Evaluation sets as {name: [(path, expected_label)]}."""
+    test_images = [(p, 'healthy') for p in list_images('test_images/healthy')]
+    test_images += [(p, 'diseased') for p in list_images('test_images/diseased')]
+    xyz = [(p, 'healthy' if os.path.basename(p).startswith('healthy_') else 'diseased') for p in list_images('xyz')]
+    return {'test_images': test_images, 'xyz': xyz}
+
+
+def calibration_paths(count):
+    """An even, deterministic mix of healthy and diseased training images."""
+    paths = []
+    for label in ('healthy', 'diseased'):
+        images = list_images(os.path.join('training_data', label))
+        step = max(1, len(images) // max(1, count // 2))
+        paths.extend(images[::step][:count // 2])
+    return paths
+
+
+def convert(model, mode, analyzer, calibration):
+    import tensorflow as tf
+
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+
+    if mode == 'int8':
+        def representative_dataset():
+            for path in calibration:
+                img = analyzer._open_image(path)
+                yield [analyzer._prepare_model_input(img)[np.newaxis]]
+
+        converter.representative_dataset = representative_dataset
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+        converter.inference_input_type = tf.int8
+        converter.inference_output_type = tf.int8
+
+    return converter.convert()
+
+
+def evaluate(analyzer, inputs):
+    """Score every prepared input one at a time; returns (scores, median latency in ms)."""
+    scores = []
+    timings = []
+    for model_input in inputs:
+        start = time.perf_counter()
+        scores.append(float(analyzer._predict_scores(model_input[np.newaxis])[0]))
+        timings.append(time.perf_counter() - start)
+    return np.array(scores), float(np.median(timings)) * 1000
+
+
+def peak_rss_mb(backend, model_path, threads):
+    """Peak RSS of a fresh process that loads the backend and runs one prediction."""
+    output = subprocess.run(
+        [sys.executable, __file__, '--measure-rss', backend, model_path, '--threads', str(threads or 0)],
+        capture_output=True, text=True, check=True
+    ).stdout.strip().splitlines()
+    return float(output[-1]) / 1024
+
+
+def measure_rss(backend, model_path, threads):
+    if backend == 'tflite':
+        analyzer = DiseaseAnalyzer(backend='tflite', tflite_path=model_path, num_threads=threads or None)
+    else:
+        analyzer = DiseaseAnalyzer()
+    size = analyzer.MODEL_INPUT_SIZE
+    analyzer._predict_scores(np.zeros((1, size, size, 3), dtype=np.float32))
+
+    # ru_maxrss survives exec on Linux and would report the parent's peak; VmHWM does not
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    print(line.split()[1])
+                    return
+    except OSError:
+        pass
+    print(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Export the Keras model to quantized TFLite.')
+    parser.add_argument('--modes', nargs='+', choices=sorted(OUTPUT_PATHS), default=['dynamic', 'int8'])
+    parser.add_argument('--calibration-samples', type=int, default=200,
+                        help='training_data/ images used to calibrate full-int8 ranges')
+    parser.add_argument('--threads', type=int, default=None, help='TFLite interpreter threads')
+    parser.add_argument('--measure-rss', nargs=2, metavar=('BACKEND', 'MODEL_PATH'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure_rss:
+        measure_rss(*args.measure_rss, args.threads)
+        return
+
+    keras_analyzer = DiseaseAnalyzer()
+    if not keras_analyzer.model_loaded:
+        print(f"Keras model not available at {keras_analyzer.model_path}; nothing to export")
+        return
+
+    calibration = calibration_paths(args.calibration_samples)
+    for mode in args.modes:
+        print(f"Converting ({mode})...")
+        flatbuffer = convert(keras_analyzer.model, mode, keras_analyzer, calibration)
+        with open(OUTPUT_PATHS[mode], 'wb') as f:
+            f.write(flatbuffer)
+        print(f"  wrote {OUTPUT_PATHS[mode]} ({len(flatbuffer) / 1e6:.2f} MB)")
+
+    # Preprocessing does not depend on the backend, so prepare every input once
+    sets = labelled_sets()
+    inputs = {}
+    labels = {}
+    for name, items in sets.items():
+        inputs[name] = [keras_analyzer._prepare_model_input(keras_analyzer._open_image(p)) for p, _ in items]
+        labels[name] = np.array([label == 'healthy' for _, label in items])
+
+    backends = [('keras', keras_analyzer.model_path, keras_analyzer)]
+    for mode in args.modes:
+        backends.append((
+            f"tflite-{mode}",
+            OUTPUT_PATHS[mode],
+            DiseaseAnalyzer(backend='tflite', tflite_path=OUTPUT_PATHS[mode], num_threads=args.threads)
+        ))
+
+    print("\n" + "=" * 100)
+    print("BACKEND COMPARISON")
+    print("=" * 100)
+    header = f"{'Backend':<16} {'Size (MB)':>10} {'Peak RSS (MB)':>14} {'Latency (ms)':>13}"
+    for name in sets:
+        header += f" {name + ' acc':>16} {'delta':>7}"
+    print(header)
+
+    baseline = {}
+    for backend_name, model_path, analyzer in backends:
+        size_mb = os.path.getsize(model_path) / 1e6
+        rss_mb = peak_rss_mb(analyzer.backend, model_path, args.threads)
+
+        row = ''
+        latencies = []
+        for name in sets:
+            if not inputs[name]:
+                row += f" {'n/a':>16} {'':>7}"
+                continue
+            scores, latency = evaluate(analyzer, inputs[name])
+            latencies.append(latency)
+            accuracy = float(np.mean((scores > 0.5) == labels[name])) * 100
+            baseline.setdefault(name, accuracy)
+            row += f" {accuracy:>15.1f}% {accuracy - baseline[name]:>+6.1f}%"
+
+        latency = float(np.mean(latencies)) if latencies else float('nan')
+        print(f"{backend_name:<16} {size_mb:>10.2f} {rss_mb:>14.1f} {latency:>13.2f}" + row)
+
+    print("=" * 100)
+
+
+if __name__ == '__main__':
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    main()
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Fleet-wide analysis statistics from the stored feature columns.
+
+Prints one row per day, week or month with the number of completed
+analyses, the share diagnosed as diseased and analyzed by the model, and the
+mean colour features, spot coverage, health score and raw model score. With
+--by-model each period is split by model version. Everything is a single
+SQL aggregate over the analysis table, so no image is opened. Analyses from
+before the features were stored count towards the totals; their features
+are left out of the means.
+
+Usage: python fleet_stats.py [--period week] [--since 2026-01-01] [--by-model] [--csv]
+"""
+import argparse
+import csv
+import os
+import sys
+from datetime import datetime
+
+COLUMNS = ['period', 'model_version', 'analyses', 'diseased_pct', 'ml_pct', 'green_pct', 'brown_pct',
+           'yellow_pct', 'spots_pct', 'health', 'model_score']
+
+
+def format_value(value, digits=1):
+    if value is None:
+        return '-'
+    if isinstance(value, float):
+        return f"{value:.{digits}f}"
+    return str(value)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Aggregate stored analysis features by period.')
+    parser.add_argument('--period', choices=['day', 'week', 'month'], default='week')
+    parser.add_argument('--since', type=datetime.fromisoformat, help='only analyses created on or after this date')
+    parser.add_argument('--by-model', action='store_true', help='one row per model version within each period')
+    parser.add_argument('--csv', action='store_true', help='write CSV to stdout instead of a table')
+    args = parser.parse_args()
+
+    from models import create_db_app, Analysis
+
+    with create_db_app().app_context():
+        rows = Analysis.fleet_stats(args.period, since=args.since, by_model=args.by_model)
+
+    if args.csv:
+        writer = csv.writer(sys.stdout)
+        writer.writerow(COLUMNS)
+        writer.writerows(rows)
+        return
+
+    columns = COLUMNS if args.by_model else [c for c in COLUMNS if c != 'model_version']
+    table = []
+    for row in rows:
+        values = [format_value(value, 3 if name == 'model_score' else 1) for name, value in zip(COLUMNS, row)]
+        if not args.by_model:
+            del values[1]
+        table.append(values)
+    widths = [max([len(name)] + [len(values[i]) for values in table]) for i, name in enumerate(columns)]
+
+    print("\n" + "  ".join(name.rjust(width) for name, width in zip(columns, widths)))
+    for values in table:
+        print("  ".join(value.rjust(width) for value, width in zip(values, widths)))
+    print(f"\n{sum(row[2] for row in rows)} completed analyses in {len(rows)} rows")
+
+
+if __name__ == '__main__':
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    main()
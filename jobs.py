@@ -0,0 +1,208 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+
+class JobQueue:
+    """
+    Durable background job queue in a local SQLite file, drained by worker threads.
+
+    enqueue() stores a JSON payload and wakes a worker, which calls
+    handler(payload). Jobs are claimed in an IMMEDIATE transaction, so several
+    server processes can share one queue file. A claimed job holds a lease of
+    lease_seconds, renewed every lease_seconds / 3 while its handler runs, so
+    slow jobs are never run twice; if its process dies, renewals stop and the
+    job is picked up again once the lease expires. A handler exception is retried up to max_attempts times,
+    after which on_failure(payload, error) is called. Done jobs are deleted
+    retention_seconds after they finish (checked at most once a minute, when
+    a worker claims a job); failed jobs are kept for inspection.
+    """
+
+    PURGE_INTERVAL = 60
+
+    def __init__(self, path, handler, workers=2, on_failure=None,
+                 max_attempts=3, lease_seconds=300, poll_interval=1.0, retention_seconds=24 * 3600):
+        self.path = path
+        self.handler = handler
+        self.on_failure = on_failure
+        self.max_attempts = max(1, int(max_attempts))
+        self.lease_seconds = float(lease_seconds)
+        self.poll_interval = float(poll_interval)
+        self.retention_seconds = float(retention_seconds)
+        self._next_purge = 0.0
+
+        self._wakeup = threading.Event()
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connect() as db:
+            db.execute(
+                'CREATE TABLE IF NOT EXISTS jobs ('
+                ' id INTEGER PRIMARY KEY AUTOINCREMENT,'
+                ' payload TEXT NOT NULL,'
+                " status TEXT NOT NULL DEFAULT 'queued',"
+                ' attempts INTEGER NOT NULL DEFAULT 0,'
+                ' error TEXT,'
+                ' lease_expires REAL,'
+                ' created_at REAL NOT NULL,'
+                ' updated_at REAL NOT NULL)'
+            )
+            db.execute('CREATE INDEX IF NOT EXISTS ix_jobs_status ON jobs (status, id)')
+            # Retention purge: finished rows by age
+            db.execute('CREATE INDEX IF NOT EXISTS ix_jobs_status_updated ON jobs (status, updated_at)')
+
+        self._workers = [
+            threading.Thread(target=self._run, name=f'job-worker-{i}', daemon=True)
+            for i in range(max(1, int(workers)))
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    def enqueue(self, payload):
+        """Queue one job; returns its id."""
+        now = time.time()
+        with self._connect() as db:
+            job_id = db.execute(
+                'INSERT INTO jobs (payload, created_at, updated_at) VALUES (?, ?, ?)',
+                (json.dumps(payload), now, now)
+            ).lastrowid
+        self._wakeup.set()
+        return job_id
+
+    def stats(self):
+        """Job counts by status."""
+        with self._connect() as db:
+            counts = dict(db.execute('SELECT status, COUNT(*) FROM jobs GROUP BY status').fetchall())
+        return {status: counts.get(status, 0) for status in ('queued', 'running', 'done', 'failed')}
+
+    @contextmanager
+    def _connect(self):
+        # Autocommit mode; multi-statement changes use explicit transactions
+        db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        try:
+            yield db
+        finally:
+            db.close()
+
+    def _run(self):
+        while True:
+            # Cleared before claiming, so an enqueue() during the claim is not missed
+            self._wakeup.clear()
+            try:
+                job = self._claim()
+            except sqlite3.Error as e:
+                logger.warning(f"Job queue read failed: {e}")
+                job = None
+
+            if job is None:
+                self._wakeup.wait(self.poll_interval)
+                continue
+
+            job_id, payload, attempts = job
+            done = threading.Event()
+            heartbeat = threading.Thread(target=self._renew_lease, args=(job_id, done),
+                                         name=f'job-lease-{job_id}', daemon=True)
+            heartbeat.start()
+            try:
+                self.handler(payload)
+            except Exception as e:
+                logger.error(f"Job {job_id} failed (attempt {attempts}/{self.max_attempts}): {e}")
+                error = str(e)
+            else:
+                error = None
+            finally:
+                done.set()
+                heartbeat.join()
+            self._finish(job_id, payload, attempts, error)
+
+    def _renew_lease(self, job_id, done):
+        """Extend a running job's lease until done is set."""
+        while not done.wait(self.lease_seconds / 3):
+            try:
+                with self._connect() as db:
+                    db.execute(
+                        "UPDATE jobs SET lease_expires = ?, updated_at = ? WHERE id = ? AND status = 'running'",
+                        (time.time() + self.lease_seconds, time.time(), job_id)
+                    )
+            except sqlite3.Error as e:
+                logger.warning(f"Job {job_id} lease renewal failed: {e}")
+
+    def _claim(self):
+        """Take the oldest runnable job, or None. Expired leases are retried or failed."""
+        now = time.time()
+        with self._connect() as db:
+            db.execute('BEGIN IMMEDIATE')
+            try:
+                expired = db.execute(
+                    "SELECT id, payload FROM jobs WHERE status = 'running' AND lease_expires < ? AND attempts >= ?",
+                    (now, self.max_attempts)
+                ).fetchall()
+                if expired:
+                    db.executemany(
+                        "UPDATE jobs SET status = 'failed', error = 'lease expired', updated_at = ? WHERE id = ?",
+                        [(now, job_id) for job_id, _ in expired]
+                    )
+
+                row = db.execute(
+                    "SELECT id, payload, attempts FROM jobs"
+                    " WHERE status = 'queued' OR (status = 'running' AND lease_expires < ?)"
+                    " ORDER BY id LIMIT 1",
+                    (now,)
+                ).fetchone()
+                if row is not None:
+                    db.execute(
+                        "UPDATE jobs SET status = 'running', attempts = attempts + 1, lease_expires = ?, updated_at = ?"
+                        " WHERE id = ?",
+                        (now + self.lease_seconds, now, row[0])
+                    )
+                    if now >= self._next_purge:
+                        self._next_purge = now + self.PURGE_INTERVAL
+                        db.execute(
+                            "DELETE FROM jobs WHERE status = 'done' AND updated_at < ?",
+                            (now - self.retention_seconds,)
+                        )
+                db.execute('COMMIT')
+            except sqlite3.Error:
+                db.execute('ROLLBACK')
+                raise
+
+        for job_id, payload in expired:
+            logger.error(f"Job {job_id} abandoned after {self.max_attempts} attempts")
+            self._notify_failure(json.loads(payload), 'lease expired')
+
+        if row is None:
+            return None
+        return row[0], json.loads(row[1]), row[2] + 1
+
+    def _finish(self, job_id, payload, attempts, error):
+        if error is None:
+            status = 'done'
+        elif attempts < self.max_attempts:
+            status = 'queued'
+        else:
+            status = 'failed'
+
+        try:
+            with self._connect() as db:
+                db.execute(
+                    'UPDATE jobs SET status = ?, error = ?, lease_expires = NULL, updated_at = ? WHERE id = ?',
+                    (status, error, time.time(), job_id)
+                )
+        except sqlite3.Error as e:
+            logger.warning(f"Job queue write failed: {e}")
+
+        if status == 'failed':
+            self._notify_failure(payload, error)
+
+    def _notify_failure(self, payload, error):
+        if self.on_failure is None:
+            return
+        try:
+            self.on_failure(payload, error)
+        except Exception as e:
+            logger.error(f"Job failure handler raised: {e}")
@@ -0,0 +1,189 @@
+"""
+Lightweight in-process metrics, rendered in the Prometheus text exposition format.
+
+Instruments are module-level so analysis code can record into them without
+being handed a registry. Values are per process: with several gunicorn
+workers or ANALYSIS_PROCESSES, each process keeps its own numbers.
+"""
+import bisect
+import functools
+import threading
+import time
+from contextlib import nullcontext
+
+# Seconds; covers a sub-millisecond colour pass up to a cold first forward pass
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_enabled = True
+_lock = threading.Lock()
+_registry = {}
+_collectors = []
+_null_timer = nullcontext()
+
+
+def set_enabled(enabled):
+    """Turn recording on or off; disabled instruments cost one flag check."""
+    global _enabled
+    _enabled = bool(enabled)
+
+
+def is_enabled():
+    return _enabled
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Monotonic count, optionally split by one label."""
+    kind = 'counter'
+
+    def __init__(self, name, documentation, label=None):
+        self.name = name
+        self.documentation = documentation
+        self.label = label
+        self._values = {} if label else {None: 0}
+
+    def inc(self, label_value=None, amount=1):
+        if not _enabled:
+            return
+        with _lock:
+            self._values[label_value] = self._values.get(label_value, 0) + amount
+
+    def samples(self):
+        with _lock:
+            values = sorted(self._values.items(), key=lambda item: str(item[0]))
+        for label_value, value in values:
+            labels = [(self.label, label_value)] if self.label else []
+            yield self.name, labels, value
+
+
+class Histogram:
+    """Latency distribution, optionally split by one label (e.g. stage)."""
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, label=None, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.label = label
+        self.buckets = tuple(buckets)
+        # label value -> [per-bucket counts (last is +Inf), sum]
+        self._series = {}
+
+    def observe(self, label_value, value):
+        if not _enabled:
+            return
+        index = bisect.bisect_left(self.buckets, value)
+        with _lock:
+            series = self._series.get(label_value)
+            if series is None:
+                series = self._series[label_value] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def time(self, label_value=None):
+        """Context manager observing the duration of its block."""
+        if not _enabled:
+            return _null_timer
+        return _Timer(self, label_value)
+
+    def timed(self, label_value=None):
+        """Decorator form of time()."""
+        def decorator(f):
+            @functools.wraps(f)
+            def wrapper(*args, **kwargs):
+                with self.time(label_value):
+                    return f(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def samples(self):
+        with _lock:
+            series = sorted(((k, list(v[0]), v[1]) for k, v in self._series.items()), key=lambda item: str(item[0]))
+        for label_value, counts, total in series:
+            labels = [(self.label, label_value)] if self.label else []
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                yield f"{self.name}_bucket", labels + [('le', _format_value(bound))], cumulative
+            yield f"{self.name}_sum", labels, total
+            yield f"{self.name}_count", labels, cumulative
+
+
+class _Timer:
+    __slots__ = ('histogram', 'label_value', 'start')
+
+    def __init__(self, histogram, label_value):
+        self.histogram = histogram
+        self.label_value = label_value
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram.observe(self.label_value, time.perf_counter() - self.start)
+        return False
+
+
+def _register(cls, name, *args, **kwargs):
+    with _lock:
+        metric = _registry.get(name)
+        if metric is None:
+            metric = _registry[name] = cls(name, *args, **kwargs)
+        return metric
+
+
+def counter(name, documentation, label=None):
+    """Get or create the counter called name."""
+    return _register(Counter, name, documentation, label)
+
+
+def histogram(name, documentation, label=None, buckets=LATENCY_BUCKETS):
+    """Get or create the histogram called name."""
+    return _register(Histogram, name, documentation, label, buckets=buckets)
+
+
+def register_collector(collect):
+    """
+    Add a callable run at scrape time, for values that already live elsewhere
+    (cache hit counts, queue depths). It returns (name, kind, documentation,
+    samples) tuples, where samples is a list of (labels dict, value).
+    """
+    _collectors.append(collect)
+
+
+def render():
+    """Every metric in the Prometheus text exposition format (version 0.0.4)."""
+    lines = []
+
+    def family(name, kind, documentation, samples):
+        lines.append(f"# HELP {name} {documentation}")
+        lines.append(f"# TYPE {name} {kind}")
+        for sample_name, labels, value in samples:
+            lines.append(f"{sample_name}{_format_labels(labels)} {_format_value(value)}")
+
+    with _lock:
+        metrics = list(_registry.values())
+    for metric in metrics:
+        family(metric.name, metric.kind, metric.documentation, metric.samples())
+
+    for collect in _collectors:
+        for name, kind, documentation, samples in collect():
+            family(name, kind, documentation,
+                   ((name, sorted(labels.items()), value) for labels, value in samples))
+
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Move flat uploads into the content-addressed upload store.
+
+Uploads used to be written as uploads/<timestamp>_<name>, one file per
+upload, however often the same image was sent. The app now stores each
+distinct image once, as uploads/<ab>/<cd>/<sha256> (see storage.py). This
+script moves every flat upload that an analysis refers to into the store,
+deleting byte-identical duplicates, records the digest on its analyses and
+rebuilds the blob reference counts. It then reports the disk space saved.
+
+Uploads of analyses still pending are skipped (their queued job refers to
+the flat path); run the script again once they have completed. Heatmaps and
+flat files no analysis refers to (e.g. sample images) are left in place;
+the latter are listed in the report. With --gc, blobs no analysis refers
+to any more are deleted once older than --grace-hours.
+
+Usage: python migrate_uploads.py [--dry-run] [--gc] [--grace-hours 1]
+"""
+import argparse
+import os
+from collections import defaultdict
+
+UPLOAD_FOLDER = 'uploads'
+
+
+def format_mb(size):
+    return f"{size / (1024 * 1024):.1f} MB"
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Move flat uploads into the content-addressed upload store.')
+    parser.add_argument('--dry-run', action='store_true', help='report what would change without touching anything')
+    parser.add_argument('--gc', action='store_true', help='also delete blobs no analysis refers to')
+    parser.add_argument('--grace-hours', type=float, default=1.0,
+                        help='only collect blobs older than this, so uploads being analyzed are kept')
+    parser.add_argument('--batch-size', type=int, default=500, help='uploads migrated per database commit')
+    args = parser.parse_args()
+
+    from migrations import add_missing_columns
+    from models import db, create_db_app, Analysis, Blob
+    from prediction_cache import file_sha256
+    from storage import BlobStore
+
+    app = create_db_app()
+    blob_store = BlobStore(UPLOAD_FOLDER)
+    upload_folder = UPLOAD_FOLDER
+    with app.app_context():
+        # The blob table and image_sha256 column, if the app has not run since they were added
+        db.create_all()
+        add_missing_columns(db)
+
+        rows_by_file = defaultdict(list)
+        heatmaps = set()
+        for analysis in Analysis.query.yield_per(1000):
+            rows_by_file[analysis.image_filename].append(analysis)
+            if analysis.heatmap_filename:
+                heatmaps.add(analysis.heatmap_filename)
+
+        migrated = duplicates = pending = missing = 0
+        bytes_before = bytes_after = 0
+        seen = set()
+        since_commit = 0
+
+        for filename, analyses in rows_by_file.items():
+            path = os.path.join(upload_folder, filename)
+            if os.path.basename(filename) != filename or not os.path.isfile(path):
+                if not all(a.image_sha256 and blob_store.exists(a.image_sha256) for a in analyses):
+                    missing += 1
+                continue
+            if any(a.status == 'pending' for a in analyses):
+                pending += 1
+                continue
+
+            if args.dry_run:
+                size = os.path.getsize(path)
+                digest = file_sha256(path)
+                created = digest not in seen and not blob_store.exists(digest)
+                seen.add(digest)
+            else:
+                digest, size, created = blob_store.adopt(path)
+                for analysis in analyses:
+                    analysis.image_sha256 = digest
+
+            migrated += 1
+            bytes_before += size
+            if created:
+                bytes_after += size
+            else:
+                duplicates += 1
+
+            since_commit += 1
+            if not args.dry_run and since_commit >= args.batch_size:
+                db.session.commit()
+                since_commit = 0
+
+        if not args.dry_run:
+            db.session.commit()
+            # Rows written before the blob table existed were never counted
+            Blob.recount()
+
+        referenced = set(rows_by_file) | heatmaps
+        orphans = [entry for entry in os.scandir(upload_folder)
+                   if entry.is_file() and not entry.name.startswith('.') and entry.name not in referenced]
+        orphan_bytes = sum(entry.stat().st_size for entry in orphans)
+
+        collected = freed = 0
+        if args.gc:
+            live = {digest for (digest,) in db.session.query(Blob.sha256).filter(Blob.ref_count > 0)}
+            collected, freed = blob_store.collect_garbage(live, args.grace_hours * 3600, dry_run=args.dry_run)
+            if not args.dry_run:
+                for blob in Blob.query.filter(Blob.ref_count <= 0):
+                    if not blob_store.exists(blob.sha256):
+                        db.session.delete(blob)
+                db.session.commit()
+
+        stored = list(blob_store.iter_blobs())
+
+    title = 'UPLOAD STORE MIGRATION' + (' (DRY RUN)' if args.dry_run else '')
+    print("\n" + "=" * 60)
+    print(title)
+    print("=" * 60)
+    print(f"Flat uploads migrated:   {migrated:>8} ({format_mb(bytes_before)})")
+    print(f"Duplicates removed:      {duplicates:>8}")
+    print(f"New blobs written:       {migrated - duplicates:>8} ({format_mb(bytes_after)})")
+    print(f"Disk saved:              {format_mb(bytes_before - bytes_after)}")
+    print(f"Skipped, still pending:  {pending:>8}")
+    print(f"Missing upload files:    {missing:>8}")
+    print(f"Unreferenced flat files: {len(orphans):>8} ({format_mb(orphan_bytes)}, left in place)")
+    if args.gc:
+        print(f"Unreferenced blobs {'to delete' if args.dry_run else 'deleted'}: {collected:>5} ({format_mb(freed)})")
+    print(f"Blobs in store:          {len(stored):>8} ({format_mb(sum(size for _, size, _ in stored))})")
+    print("=" * 60)
+
+
+if __name__ == '__main__':
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    main()
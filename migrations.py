@@ -0,0 +1,110 @@
+import hashlib
+import logging
+from datetime import datetime
+from sqlalchemy import inspect, text
+from sqlalchemy.schema import CreateColumn
+
+logger = logging.getLogger(__name__)
+
+
+def add_missing_columns(db):
+    """
+    Add model columns that an existing database does not have yet.
+
+    db.create_all() creates missing tables but never alters existing ones, so
+    databases created by an older version of the app would otherwise lack
+    newly added columns. Only additive changes are handled: a new column must
+    be nullable or have a server_default so existing rows stay valid.
+    """
+    inspector = inspect(db.engine)
+    dialect = db.engine.dialect
+    preparer = dialect.identifier_preparer
+
+    with db.engine.begin() as connection:
+        for table in db.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+
+            existing = {column['name'] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+
+                definition = CreateColumn(column).compile(dialect=dialect)
+                connection.execute(text(f"ALTER TABLE {preparer.format_table(table)} ADD COLUMN {definition}"))
+                logger.info(f"Added column {table.name}.{column.name}")
+
+
+def add_missing_indexes(db):
+    """
+    Create model indexes that an existing database does not have yet; like
+    add_missing_columns, this covers what db.create_all() skips for tables
+    that already exist.
+    """
+    inspector = inspect(db.engine)
+
+    with db.engine.begin() as connection:
+        for table in db.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+
+            existing = {index['name'] for index in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name not in existing:
+                    index.create(connection)
+                    logger.info(f"Created index {index.name} on {table.name}")
+
+
+def move_disease_text(db):
+    """
+    Move disease text out of the analysis table into the disease_info
+    catalogue, for databases created before it existed.
+
+    Every distinct description/treatment/prevention combination is matched
+    to the catalogue entry with the same text, or added as a new entry if it
+    was edited since. Each analysis then gets that entry's key, and the
+    per-row copies are dropped. Runs once: later calls find no text columns.
+    """
+    inspector = inspect(db.engine)
+    if not inspector.has_table('analysis'):
+        return
+    columns = {column['name'] for column in inspector.get_columns('analysis')}
+    if not {'description', 'treatment', 'prevention'} <= columns:
+        return
+
+    with db.engine.begin() as connection:
+        catalogue = {
+            (description, treatment, prevention): key
+            for key, description, treatment, prevention in connection.execute(
+                text("SELECT key, description, treatment, prevention FROM disease_info"))
+        }
+        groups = connection.execute(text(
+            "SELECT description, treatment, prevention, MIN(disease_detected), COUNT(*) FROM analysis "
+            "WHERE disease_key IS NULL GROUP BY description, treatment, prevention"
+        )).fetchall()
+
+        for description, treatment, prevention, name, count in groups:
+            key = catalogue.get((description, treatment, prevention))
+            if key is None:
+                key = 'legacy_' + hashlib.sha256('\0'.join((description, treatment, prevention)).encode('utf-8')).hexdigest()[:12]
+                connection.execute(text(
+                    "INSERT INTO disease_info (key, name, description, treatment, prevention, updated_at) "
+                    "VALUES (:key, :name, :description, :treatment, :prevention, :now)"
+                ), {'key': key, 'name': name, 'description': description, 'treatment': treatment,
+                    'prevention': prevention, 'now': datetime.utcnow()})
+                catalogue[(description, treatment, prevention)] = key
+            connection.execute(text(
+                "UPDATE analysis SET disease_key = :key WHERE disease_key IS NULL "
+                "AND description = :description AND treatment = :treatment AND prevention = :prevention"
+            ), {'key': key, 'description': description, 'treatment': treatment, 'prevention': prevention})
+
+        for column in ('description', 'treatment', 'prevention'):
+            connection.execute(text(f"ALTER TABLE analysis DROP COLUMN {column}"))
+
+    logger.info(f"Moved disease text of {sum(group[-1] for group in groups)} analyses "
+                f"into {len(groups)} catalogue entries")
+
+    if db.engine.dialect.name == 'sqlite':
+        # Return the freed pages to the filesystem
+        with db.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as connection:
+            connection.execute(text("VACUUM"))
@@ -1,10 +1,30 @@
 
+import os
+from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import and_, case, event, func, inspect, text, tuple_
 from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime
 
 db = SQLAlchemy()
 
+# Relative SQLite paths resolve inside the Flask instance folder
+DATABASE_URL = os.environ.get('DATABASE_URL', 'sqlite:///plant_disease.db')
+
+
+def create_db_app():
+    """
+    Minimal Flask app bound to the application database, for scripts that
+    need SQL access without the web app's start-up (SESSION_SECRET, model
+    loading, job queue). Tables must already exist; the web app creates and
+    migrates them.
+    """
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = DATABASE_URL
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(app)
+    return app
+
 class User(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(80), unique=True, nullable=False)
@@ -28,16 +48,275 @@ class User(db.Model):
 
 
 class Analysis(db.Model):
+    __table_args__ = (
+        # Serves history pages: one user's rows in (created_at, id) order
+        db.Index('ix_analysis_user_created', 'user_id', 'created_at', 'id'),
+        # Serve fleet-wide aggregates over time (fleet_stats.py), overall and per model
+        db.Index('ix_analysis_created', 'created_at'),
+        db.Index('ix_analysis_model_version', 'model_version', 'created_at'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     image_filename = db.Column(db.String(255), nullable=False)
+    # SHA-256 of the uploaded bytes: the image's blob in the upload store (None for older, unmigrated rows)
+    image_sha256 = db.Column(db.String(64))
     disease_detected = db.Column(db.String(100), nullable=False)
     confidence = db.Column(db.Float, nullable=False)
     severity = db.Column(db.String(50), nullable=False)
+    # Catalogue entry holding the description, treatment and prevention text shown for this result
+    disease_key = db.Column(db.String(50), db.ForeignKey('disease_info.key'))
+    disease_info = db.relationship('DiseaseInfo')
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # 'pending' while an asynchronous analysis job is queued, then 'complete' or 'failed'
+    status = db.Column(db.String(20), nullable=False, default='complete', server_default='complete')
+    # Tiled-mode disease heatmap overlay, stored next to the upload
+    heatmap_filename = db.Column(db.String(255))
+    # Image features from analysis_details, kept for SQL analytics (None for rows analyzed before they were stored)
+    green_content = db.Column(db.Float)
+    brown_content = db.Column(db.Float)
+    yellow_content = db.Column(db.Float)
+    # Share of dark, spot-like pixels in %, despite the name
+    spots_detected = db.Column(db.Float)
+    overall_health = db.Column(db.Float)
+    ml_powered = db.Column(db.Boolean)
+    # Raw healthy-probability output and backend:hash of the model that produced it (None for rule-based results)
+    model_score = db.Column(db.Float)
+    model_version = db.Column(db.String(64))
+
+    FEATURE_FIELDS = ('green_content', 'brown_content', 'yellow_content', 'spots_detected',
+                      'overall_health', 'ml_powered', 'model_score', 'model_version')
+
+    @classmethod
+    def pending(cls, user_id, image_filename):
+        """A placeholder row for an upload whose analysis job has not run yet."""
+        return cls(
+            user_id=user_id,
+            image_filename=image_filename,
+            disease_detected='Analysis pending',
+            confidence=0.0,
+            severity='Pending',
+            disease_key='pending',
+            status='pending'
+        )
+
+    def mark_failed(self):
+        self.disease_detected = 'Analysis failed'
+        self.severity = 'Unknown'
+        self.disease_key = 'failed'
+        self.status = 'failed'
+
+    @property
+    def description(self):
+        return self.disease_info.description if self.disease_info else ''
+
+    @property
+    def treatment(self):
+        return self.disease_info.treatment if self.disease_info else ''
+
+    @property
+    def prevention(self):
+        return self.disease_info.prevention if self.disease_info else ''
+
+    @property
+    def is_complete(self):
+        return self.status == 'complete'
+
+    @property
+    def analysis_details(self):
+        """The stored analysis_details features, as analyze_image reported them."""
+        return {field: getattr(self, field) for field in self.FEATURE_FIELDS}
+
+    @classmethod
+    def history_page(cls, user_id, limit, before=None, after=None):
+        """
+        One page of a user's analyses, newest first, by keyset pagination on
+        (created_at, id). before/after are the (created_at, id) of the row just
+        past either end of the page, so each page is an index range scan no
+        matter how deep it is. Returns (rows, more), where more says whether
+        further rows exist in the direction of travel.
+        """
+        key = tuple_(cls.created_at, cls.id)
+        query = cls.query.filter(cls.user_id == user_id)
+        if after is not None:
+            query = query.filter(key > tuple_(*after)).order_by(cls.created_at.asc(), cls.id.asc())
+        else:
+            if before is not None:
+                query = query.filter(key < tuple_(*before))
+            query = query.order_by(cls.created_at.desc(), cls.id.desc())
+
+        rows = query.limit(limit + 1).all()
+        more = len(rows) > limit
+        rows = rows[:limit]
+        if after is not None:
+            rows.reverse()
+        return rows, more
+
+    @classmethod
+    def history_stats(cls, user_id):
+        """Total, healthy and diseased counts for a user, in one aggregate query."""
+        healthy = cls.disease_detected == 'Healthy Plant'
+        total, healthy_count, diseased_count = db.session.query(
+            func.count(cls.id),
+            func.sum(case((healthy, 1), else_=0)),
+            func.sum(case((and_(cls.status == 'complete', ~healthy), 1), else_=0))
+        ).filter(cls.user_id == user_id).one()
+        return {'total': total, 'healthy': healthy_count or 0, 'diseased': diseased_count or 0}
+
+    @classmethod
+    def fleet_stats(cls, period='week', since=None, by_model=False):
+        """
+        Feature averages over all completed analyses, one row per period
+        ('day', 'week' or 'month'), and per model version with by_model.
+        Rows are (period, model_version or None, analyses, diseased share %,
+        ML share %, mean green, brown and yellow %, mean spot %, mean health,
+        mean model score), oldest period first.
+        """
+        bucket = cls._period_bucket(period).label('period')
+        version = (cls.model_version if by_model else db.literal(None)).label('model_version')
+        diseased = case((cls.disease_detected != 'Healthy Plant', 100.0), else_=0.0)
+        # Rows from before features were stored count as unknown, not as rule-based
+        ml = case((cls.ml_powered.is_(True), 100.0), (cls.ml_powered.is_(False), 0.0))
+        query = db.session.query(
+            bucket,
+            version,
+            func.count(cls.id),
+            func.avg(diseased),
+            func.avg(ml),
+            func.avg(cls.green_content),
+            func.avg(cls.brown_content),
+            func.avg(cls.yellow_content),
+            func.avg(cls.spots_detected),
+            func.avg(cls.overall_health),
+            func.avg(cls.model_score)
+        ).filter(cls.status == 'complete')
+        if since is not None:
+            query = query.filter(cls.created_at >= since)
+        group = (bucket, cls.model_version) if by_model else (bucket,)
+        return query.group_by(*group).order_by(bucket, version).all()
+
+    @classmethod
+    def _period_bucket(cls, period):
+        """created_at truncated to the start of its day, week or month, as text."""
+        if period not in ('day', 'week', 'month'):
+            raise ValueError(f"Unknown period: {period}")
+        if db.engine.dialect.name == 'sqlite':
+            # Weeks start on Monday, like PostgreSQL's date_trunc
+            formats = {
+                'day': func.date(cls.created_at),
+                'week': func.date(cls.created_at, '-6 days', 'weekday 1'),
+                'month': func.strftime('%Y-%m-01', cls.created_at)
+            }
+            return formats[period]
+        return func.to_char(func.date_trunc(period, cls.created_at), 'YYYY-MM-DD')
+
+    def __repr__(self):
+        return f'<Analysis {self.id}: {self.disease_detected}>'
+
+
+class DiseaseInfo(db.Model):
+    """
+    Catalogue of the text shown with a result, one row per disease (plus the
+    pending and failed states), referenced by Analysis.disease_key instead of
+    being copied into every analysis. Editing an entry updates every result
+    that uses it.
+    """
+    key = db.Column(db.String(50), primary_key=True)
+    name = db.Column(db.String(100), nullable=False)
     description = db.Column(db.Text, nullable=False)
     treatment = db.Column(db.Text, nullable=False)
     prevention = db.Column(db.Text, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    # Entries for analyses that have no result (yet)
+    STATUS_ENTRIES = {
+        'pending': {
+            'name': 'Analysis pending',
+            'description': 'This image is queued for analysis.',
+            'treatment': '',
+            'prevention': ''
+        },
+        'failed': {
+            'name': 'Analysis failed',
+            'description': 'This image could not be analyzed. Please try uploading it again.',
+            'treatment': '',
+            'prevention': ''
+        }
+    }
+
+    @classmethod
+    def seed(cls, catalogue):
+        """Add catalogue entries (key -> name/description/treatment/prevention) that are missing; existing rows are kept as edited."""
+        existing = {key for (key,) in db.session.query(cls.key)}
+        for key, info in {**catalogue, **cls.STATUS_ENTRIES}.items():
+            if key not in existing:
+                db.session.add(cls(key=key, **{field: info[field] for field in ('name', 'description', 'treatment', 'prevention')}))
+        db.session.commit()
+
+    def __repr__(self):
+        return f'<DiseaseInfo {self.key}>'
+
+
+class Blob(db.Model):
+    """
+    Reference count of a stored upload (storage.BlobStore), maintained from
+    Analysis.image_sha256 by the mapper events below. Blobs left with no
+    references are deleted by migrate_uploads.py --gc.
+    """
+    sha256 = db.Column(db.String(64), primary_key=True)
+    ref_count = db.Column(db.Integer, nullable=False, default=0)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    @classmethod
+    def recount(cls):
+        """Rebuild every reference count from the analysis table."""
+        db.session.query(cls).update({cls.ref_count: 0})
+        counts = db.session.query(Analysis.image_sha256, func.count(Analysis.id)).filter(
+            Analysis.image_sha256.isnot(None)).group_by(Analysis.image_sha256).all()
+        for digest, count in counts:
+            blob = db.session.get(cls, digest)
+            if blob is None:
+                db.session.add(cls(sha256=digest, ref_count=count))
+            else:
+                blob.ref_count = count
+        db.session.commit()
+
     def __repr__(self):
-        return f'<Analysis {self.id}: {self.disease_detected}>'
+        return f'<Blob {self.sha256[:12]}: {self.ref_count} refs>'
+
+
+# Upsert, so the first reference creates the row (SQLite 3.24+ and PostgreSQL)
+_ADD_BLOB_REF = text(
+    "INSERT INTO blob (sha256, ref_count, created_at) VALUES (:digest, 1, :now) "
+    "ON CONFLICT (sha256) DO UPDATE SET ref_count = blob.ref_count + 1"
+)
+_DROP_BLOB_REF = text("UPDATE blob SET ref_count = ref_count - 1 WHERE sha256 = :digest AND ref_count > 0")
+
+
+def _add_blob_ref(connection, digest):
+    if digest:
+        connection.execute(_ADD_BLOB_REF, {'digest': digest, 'now': datetime.utcnow()})
+
+
+def _drop_blob_ref(connection, digest):
+    if digest:
+        connection.execute(_DROP_BLOB_REF, {'digest': digest})
+
+
+@event.listens_for(Analysis, 'after_insert')
+def _count_blob_insert(mapper, connection, analysis):
+    _add_blob_ref(connection, analysis.image_sha256)
+
+
+@event.listens_for(Analysis, 'after_delete')
+def _count_blob_delete(mapper, connection, analysis):
+    _drop_blob_ref(connection, analysis.image_sha256)
+
+
+@event.listens_for(Analysis, 'after_update')
+def _count_blob_update(mapper, connection, analysis):
+    history = inspect(analysis).attrs.image_sha256.history
+    if history.has_changes():
+        for old in history.deleted:
+            _drop_blob_ref(connection, old)
+        _add_blob_ref(connection, analysis.image_sha256)
@@ -0,0 +1,196 @@
+import copy
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+
+def file_sha256(path):
+    """SHA-256 hex digest of a file's bytes."""
+    with open(path, 'rb') as f:
+        return hashlib.file_digest(f, 'sha256').hexdigest()
+
+
+class PredictionCache:
+    """
+    Content-addressed cache of analyze_image results.
+
+    Entries are keyed by the SHA-256 of the image bytes plus the analyzer's
+    result fingerprint (model file hash, or 'rule-based'). An in-memory LRU
+    tier is always used; an optional SQLite tier persists results across
+    restarts and evicts least recently used rows beyond disk_max_bytes.
+    When the fingerprint changes, for example because a new model file was
+    loaded, every result cached under the old one is dropped. A None
+    fingerprint (model still loading, or replaced on disk but not yet
+    reloaded) bypasses the cache without storing anything. Rule-based
+    fallback results produced under a model fingerprint (the forward pass
+    failed) are not stored, so a transient model error is not pinned to the
+    image until the model changes.
+    """
+
+    def __init__(self, max_entries=512, disk_path=None, disk_max_bytes=256 * 1024 * 1024):
+        self.max_entries = max(1, int(max_entries))
+        self.disk_path = disk_path
+        self.disk_max_bytes = int(disk_max_bytes)
+
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._fingerprint = None
+        self._db = None
+        self.hits = 0
+        self.misses = 0
+
+        if disk_path:
+            os.makedirs(os.path.dirname(os.path.abspath(disk_path)), exist_ok=True)
+            self._db = sqlite3.connect(disk_path, timeout=5, check_same_thread=False)
+            self._db.execute(
+                'CREATE TABLE IF NOT EXISTS predictions ('
+                ' key TEXT PRIMARY KEY,'
+                ' fingerprint TEXT NOT NULL,'
+                ' result TEXT NOT NULL,'
+                ' size INTEGER NOT NULL,'
+                ' last_used REAL NOT NULL)'
+            )
+            self._db.execute('CREATE INDEX IF NOT EXISTS ix_predictions_last_used ON predictions (last_used)')
+            self._db.commit()
+
+    def get_or_compute(self, digest, fingerprint, compute):
+        """
+        Return the cached result for (digest, fingerprint), or call compute()
+        and cache what it returns. analysis_details['cache_hit'] records which
+        happened. A None fingerprint bypasses the cache.
+        """
+        result = self.get(digest, fingerprint)
+        if result is not None:
+            return result
+
+        result = compute()
+        self.put(digest, fingerprint, result)
+        result.setdefault('analysis_details', {})['cache_hit'] = False
+        return result
+
+    def get(self, digest, fingerprint):
+        with self._lock:
+            if not self._check_fingerprint(fingerprint):
+                self.misses += 1
+                return None
+
+            key = f"{fingerprint}:{digest}"
+            result = self._memory.get(key)
+            if result is not None:
+                self._memory.move_to_end(key)
+            elif self._db is not None:
+                result = self._disk_get(key)
+                if result is not None:
+                    self._memory_put(key, result)
+
+            if result is None:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+
+        result = copy.deepcopy(result)
+        result.setdefault('analysis_details', {})['cache_hit'] = True
+        return result
+
+    def put(self, digest, fingerprint, result):
+        with self._lock:
+            if not self._check_fingerprint(fingerprint):
+                return
+            if self._is_model_fallback(fingerprint, result):
+                logger.info(f"Not caching rule-based fallback result for {digest[:12]}")
+                return
+
+            key = f"{fingerprint}:{digest}"
+            result = copy.deepcopy(result)
+            result.get('analysis_details', {}).pop('cache_hit', None)
+            self._memory_put(key, result)
+            if self._db is not None:
+                self._disk_put(key, fingerprint, result)
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            if self._db is not None:
+                self._db.execute('DELETE FROM predictions')
+                self._db.commit()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'memory_entries': len(self._memory),
+                'fingerprint': self._fingerprint,
+            }
+
+    def _check_fingerprint(self, fingerprint):
+        """Drop everything cached under a different fingerprint. Caller holds the lock."""
+        if fingerprint is None:
+            return False
+        if fingerprint == self._fingerprint:
+            return True
+
+        if self._fingerprint is not None:
+            logger.info(f"Prediction cache fingerprint changed ({self._fingerprint} -> {fingerprint}), invalidating")
+        self._fingerprint = fingerprint
+        self._memory.clear()
+        if self._db is not None:
+            self._db.execute('DELETE FROM predictions WHERE fingerprint != ?', (fingerprint,))
+            self._db.commit()
+        return True
+
+    @staticmethod
+    def _is_model_fallback(fingerprint, result):
+        """Whether result came from the rules although fingerprint names a model."""
+        path = result.get('analysis_details', {}).get('analysis_path')
+        return path == 'rules' and not fingerprint.startswith('rule-based:')
+
+    def _memory_put(self, key, result):
+        self._memory[key] = result
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _disk_get(self, key):
+        try:
+            row = self._db.execute('SELECT result FROM predictions WHERE key = ?', (key,)).fetchone()
+            if row is None:
+                return None
+            self._db.execute('UPDATE predictions SET last_used = ? WHERE key = ?', (time.time(), key))
+            self._db.commit()
+            return json.loads(row[0])
+        except sqlite3.Error as e:
+            logger.warning(f"Prediction cache read failed: {e}")
+            return None
+
+    def _disk_put(self, key, fingerprint, result):
+        payload = json.dumps(result)
+        try:
+            self._db.execute(
+                'INSERT OR REPLACE INTO predictions (key, fingerprint, result, size, last_used) VALUES (?, ?, ?, ?, ?)',
+                (key, fingerprint, payload, len(payload), time.time())
+            )
+
+            total = self._db.execute('SELECT COALESCE(SUM(size), 0) FROM predictions').fetchone()[0]
+            if total > self.disk_max_bytes:
+                # Evict least recently used rows until back under the size cap
+                excess = total - self.disk_max_bytes
+                freed = 0
+                stale = []
+                for row_key, size in self._db.execute('SELECT key, size FROM predictions ORDER BY last_used'):
+                    if freed >= excess:
+                        break
+                    stale.append((row_key,))
+                    freed += size
+                self._db.executemany('DELETE FROM predictions WHERE key = ?', stale)
+            self._db.commit()
+        except sqlite3.Error as e:
+            logger.warning(f"Prediction cache write failed: {e}")
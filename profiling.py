@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+On-demand sampling profiler that writes collapsed stacks.
+
+A background thread samples Python stacks every `interval` seconds and
+counts identical stacks. The output has one "frame;frame;...;leaf count"
+line per stack, which flamegraph.pl, inferno and speedscope render
+directly. Nothing runs until a profile is started, so leaving this wired
+into the app costs nothing. While sampling, overhead is one stack walk per
+interval.
+
+The app uses it for single /upload requests (see PROFILING in app.py).
+Run from the command line, it profiles any script, e.g. a whole xyz/ pass:
+
+Usage: python profiling.py [--interval 0.005] [--output-dir profiles] [--keep 50]
+                           SCRIPT [ARGS...]
+"""
+import argparse
+import logging
+import os
+import runpy
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+PROFILE_DIR = 'profiles'
+PROFILE_EXTENSION = '.folded'
+
+
+class SamplingProfiler:
+    """
+    Samples the calling thread (or every thread, each stack prefixed with
+    its thread name) from start() until stop().
+    """
+
+    def __init__(self, interval=0.005, all_threads=False):
+        self.interval = interval
+        self.all_threads = all_threads
+        self.stacks = Counter()
+        self.samples = 0
+        self.elapsed = 0.0
+        self._labels = {}
+        self._thread_names = {}
+        self._target = None
+        self._started = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._target = threading.get_ident()
+        self._stop.clear()
+        self._started = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name='sampling-profiler', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.elapsed = time.perf_counter() - self._started
+        return self
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+        return False
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            if self.all_threads:
+                for ident, frame in frames.items():
+                    if ident != own:
+                        self._record(frame, self._thread_name(ident))
+            elif self._target in frames:
+                self._record(frames[self._target])
+            self.samples += 1
+
+    def _record(self, frame, prefix=None):
+        stack = []
+        while frame is not None:
+            stack.append(self._label(frame.f_code))
+            frame = frame.f_back
+        if prefix:
+            stack.append(prefix)
+        self.stacks[';'.join(reversed(stack))] += 1
+
+    def _label(self, code):
+        label = self._labels.get(code)
+        if label is None:
+            label = f"{code.co_qualname} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+            label = self._labels[code] = label.replace(';', ',')
+        return label
+
+    def _thread_name(self, ident):
+        name = self._thread_names.get(ident)
+        if name is None:
+            self._thread_names = {t.ident: f"thread {t.name}" for t in threading.enumerate()}
+            name = self._thread_names.get(ident, f"thread {ident}")
+        return name
+
+    def collapsed(self):
+        """The collected stacks in collapsed ("folded") format, most frequent first."""
+        return ''.join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+    def save(self, label, directory=PROFILE_DIR, keep=50):
+        """Write the profile as <timestamp>_<label>.folded, pruning directory to the newest keep files."""
+        os.makedirs(directory, exist_ok=True)
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S_%f')
+        path = os.path.join(directory, f"{timestamp}_{label}{PROFILE_EXTENSION}")
+        with open(path, 'w') as f:
+            f.write(self.collapsed())
+        prune_profiles(directory, keep)
+        return path
+
+
+def prune_profiles(directory, keep):
+    """Delete all but the newest keep profiles in directory."""
+    profiles = [entry for entry in os.scandir(directory)
+                if entry.is_file() and entry.name.endswith(PROFILE_EXTENSION)]
+    profiles.sort(key=lambda entry: entry.stat().st_mtime, reverse=True)
+    for entry in profiles[max(0, keep):]:
+        try:
+            os.remove(entry.path)
+        except OSError as e:
+            logger.warning(f"Could not remove old profile {entry.name}: {e}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Profile a Python script into a collapsed-stack file.')
+    parser.add_argument('--interval', type=float, default=0.005, help='seconds between samples')
+    parser.add_argument('--output-dir', default=PROFILE_DIR)
+    parser.add_argument('--keep', type=int, default=50, help='profiles to keep in the output directory')
+    parser.add_argument('script')
+    parser.add_argument('args', nargs=argparse.REMAINDER)
+    args = parser.parse_args()
+
+    # Scripts often chdir to their own directory; keep the output where the user asked
+    output_dir = os.path.abspath(args.output_dir)
+    sys.argv = [args.script] + args.args
+    sys.path.insert(0, os.path.dirname(os.path.abspath(args.script)))
+
+    # Every thread, so decode pools and the micro-batcher show up too
+    profiler = SamplingProfiler(interval=args.interval, all_threads=True)
+    try:
+        with profiler:
+            runpy.run_path(args.script, run_name='__main__')
+    finally:
+        label = os.path.splitext(os.path.basename(args.script))[0]
+        path = profiler.save(label, output_dir, args.keep)
+        print(f"Profile: {profiler.samples} samples over {profiler.elapsed:.1f}s, "
+              f"{len(profiler.stacks)} distinct stacks -> {path}", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
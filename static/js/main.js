@@ -59,6 +59,9 @@ document.addEventListener('DOMContentLoaded', function() {
 
     // Auto-dismiss alerts
     setupAutoDismissAlerts();
+
+    // Poll pending asynchronous analyses
+    setupStatusPolling();
 });
 
 /**
@@ -296,3 +299,31 @@ function copyToClipboard(text) {
         showAlert('Failed to copy to clipboard.', 'error');
     });
 }
+
+/**
+ * Poll the status endpoint of a pending analysis and reload once it finishes
+ */
+function setupStatusPolling() {
+    const pending = document.getElementById('analysisPending');
+    if (!pending) return;
+
+    const statusUrl = pending.dataset.statusUrl;
+    let delay = 1000;
+
+    function poll() {
+        fetch(statusUrl, { headers: { 'Accept': 'application/json' } })
+            .then(response => response.json())
+            .then(data => {
+                if (data.status === 'pending') {
+                    // Back off gradually for slow jobs
+                    delay = Math.min(delay * 1.5, 5000);
+                    setTimeout(poll, delay);
+                } else {
+                    window.location.reload();
+                }
+            })
+            .catch(() => setTimeout(poll, 5000));
+    }
+
+    setTimeout(poll, delay);
+}
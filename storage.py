@@ -0,0 +1,138 @@
+import hashlib
+import logging
+import os
+import tempfile
+import time
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 1024 * 1024
+
+
+def is_digest(value):
+    """Whether value looks like a lowercase hex SHA-256 digest."""
+    return len(value) == 64 and all(c in '0123456789abcdef' for c in value)
+
+
+class BlobStore:
+    """
+    Content-addressed file store: each distinct upload is kept once, as
+    <root>/<ab>/<cd>/<sha256>, however many analyses refer to it.
+
+    save() hashes the stream while writing it to a temporary file, then
+    renames it into place, or discards it if the same bytes are already
+    stored. Blobs are never modified. References are counted in the Blob
+    table (see models.py); unreferenced blobs are removed by
+    collect_garbage().
+    """
+
+    def __init__(self, root):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def path(self, digest):
+        return os.path.join(self.root, digest[:2], digest[2:4], digest)
+
+    def relative_path(self, digest):
+        """Path below root, with forward slashes (for proxy internal redirects)."""
+        return f"{digest[:2]}/{digest[2:4]}/{digest}"
+
+    def exists(self, digest):
+        return os.path.isfile(self.path(digest))
+
+    def save(self, stream):
+        """Store a binary stream; returns (digest, size, created), where created is False for a duplicate."""
+        sha256 = hashlib.sha256()
+        size = 0
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, prefix='.upload-', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                while True:
+                    chunk = stream.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    sha256.update(chunk)
+                    f.write(chunk)
+                    size += len(chunk)
+
+            digest = sha256.hexdigest()
+            path = self.path(digest)
+            if os.path.exists(path):
+                os.remove(tmp_path)
+                # Touch, so a concurrent garbage collection sees it as fresh
+                os.utime(path)
+                return digest, size, False
+
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(tmp_path, path)
+            return digest, size, True
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def adopt(self, source_path):
+        """
+        Move an existing file into the store (renamed, not copied, when it is
+        on the same filesystem); a duplicate is simply deleted. Returns
+        (digest, size, created) like save().
+        """
+        sha256 = hashlib.sha256()
+        size = 0
+        with open(source_path, 'rb') as f:
+            while True:
+                chunk = f.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                sha256.update(chunk)
+                size += len(chunk)
+
+        digest = sha256.hexdigest()
+        path = self.path(digest)
+        if os.path.exists(path):
+            os.remove(source_path)
+            return digest, size, False
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        try:
+            os.replace(source_path, path)
+        except OSError:
+            # Different filesystem: copy via a temporary file, then drop the original
+            with open(source_path, 'rb') as f:
+                self.save(f)
+            os.remove(source_path)
+        return digest, size, True
+
+    def iter_blobs(self):
+        """(digest, size, mtime) for every stored blob."""
+        for first in os.scandir(self.root):
+            if not (first.is_dir() and len(first.name) == 2):
+                continue
+            for second in os.scandir(first.path):
+                if not second.is_dir():
+                    continue
+                for entry in os.scandir(second.path):
+                    if entry.is_file() and is_digest(entry.name):
+                        stat = entry.stat()
+                        yield entry.name, stat.st_size, stat.st_mtime
+
+    def collect_garbage(self, referenced, grace_seconds=3600, dry_run=False):
+        """
+        Delete blobs whose digest is not in referenced, once they are older
+        than grace_seconds (so uploads still being analyzed are kept).
+        Returns (blobs removed, bytes freed).
+        """
+        cutoff = time.time() - grace_seconds
+        removed = freed = 0
+        for digest, size, mtime in list(self.iter_blobs()):
+            if digest in referenced or mtime > cutoff:
+                continue
+            if not dry_run:
+                try:
+                    os.remove(self.path(digest))
+                except OSError as e:
+                    logger.warning(f"Could not remove blob {digest}: {e}")
+                    continue
+            removed += 1
+            freed += size
+        return removed, freed
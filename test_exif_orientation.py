@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Test that analysis follows the EXIF orientation of camera photos, so the
+tiled heatmap lines up with the image the browser and thumbnails display.
+"""
+import io
+import numpy as np
+from PIL import Image
+from analysis import DiseaseAnalyzer
+
+
+def rotated_jpeg():
+    """A 600x300 JPEG stored sideways: green left half, brown right half, Orientation=6."""
+    pixels = np.zeros((300, 600, 3), dtype=np.uint8)
+    pixels[:, :300] = (40, 160, 40)
+    pixels[:, 300:] = (140, 90, 40)
+    exif = Image.Exif()
+    exif[0x0112] = 6  # Rotate 90 CW to display
+    buffer = io.BytesIO()
+    Image.fromarray(pixels, 'RGB').save(buffer, 'JPEG', quality=95, exif=exif)
+    buffer.seek(0)
+    return buffer
+
+
+def make_analyzer(working_resolution=None):
+    return DiseaseAnalyzer(load_model=False, working_resolution=working_resolution, tiled=True)
+
+
+def test_open_image_applies_orientation():
+    img = make_analyzer()._open_image(rotated_jpeg())
+    assert img.size == (300, 600), img.size
+
+    # Orientation 6 turns the raw left (green) half into the displayed top half
+    pixels = np.asarray(img)
+    top, bottom = pixels[:300].mean(axis=(0, 1)), pixels[300:].mean(axis=(0, 1))
+    assert top[1] > top[0] and bottom[0] > bottom[1], (top, bottom)
+
+
+def test_open_image_applies_orientation_with_draft():
+    analyzer = make_analyzer(working_resolution=300)
+    img = analyzer._open_image(rotated_jpeg())
+    assert img.size == (150, 300), img.size
+
+
+def test_tiles_use_displayed_orientation():
+    analyzer = make_analyzer()
+    img = analyzer._open_image(rotated_jpeg())
+    _, green_mask = analyzer._extract_features_and_mask(img)
+    tiles = analyzer._prepare_tiles(img, green_mask)
+
+    assert tiles.image_size == (300, 600), tiles.image_size
+    # Leafy tiles come from the top (green) half of the displayed image
+    assert all(y + analyzer.MODEL_INPUT_SIZE <= 400 for _, y in tiles.positions), tiles.positions
+
+
+if __name__ == '__main__':
+    for test in (test_open_image_applies_orientation,
+                 test_open_image_applies_orientation_with_draft,
+                 test_tiles_use_displayed_orientation):
+        test()
+        print(f"PASS {test.__name__}")
@@ -24,30 +24,30 @@ healthy_wrong = 0
 diseased_correct = 0
 diseased_wrong = 0
 
-# Test ALL healthy images
-for filename in healthy_files:
-    filepath = os.path.join(xyz_dir, filename)
-    try:
-        result = analyzer.analyze_image(filepath)
-        if result['disease'] == 'healthy':
-            healthy_correct += 1
-        else:
-            healthy_wrong += 1
-    except Exception as e:
-        print(f"ERROR on {filename}: {e}")
+# Test ALL healthy images in one batched pass
+healthy_results = analyzer.analyze_batch(
+    [os.path.join(xyz_dir, f) for f in healthy_files], return_exceptions=True
+)
+for filename, result in zip(healthy_files, healthy_results):
+    if isinstance(result, Exception):
+        print(f"ERROR on {filename}: {result}")
+        healthy_wrong += 1
+    elif result['disease'] == 'healthy':
+        healthy_correct += 1
+    else:
         healthy_wrong += 1
 
-# Test ALL diseased images  
-for filename in diseased_files:
-    filepath = os.path.join(xyz_dir, filename)
-    try:
-        result = analyzer.analyze_image(filepath)
-        if result['disease'] == 'diseased':
-            diseased_correct += 1
-        else:
-            diseased_wrong += 1
-    except Exception as e:
-        print(f"ERROR on {filename}: {e}")
+# Test ALL diseased images in one batched pass
+diseased_results = analyzer.analyze_batch(
+    [os.path.join(xyz_dir, f) for f in diseased_files], return_exceptions=True
+)
+for filename, result in zip(diseased_files, diseased_results):
+    if isinstance(result, Exception):
+        print(f"ERROR on {filename}: {result}")
+        diseased_wrong += 1
+    elif result['disease'] == 'diseased':
+        diseased_correct += 1
+    else:
         diseased_wrong += 1
 
 print("\n" + "="*80)
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Test move_disease_text on a database created before the DiseaseInfo
+catalogue: populated rows must end up pointing at the catalogue entry with
+their text, and the per-row text columns must be gone.
+"""
+import os
+import tempfile
+from flask import Flask
+from sqlalchemy import inspect, text
+from analysis import DiseaseAnalyzer
+from migrations import add_missing_columns, add_missing_indexes, move_disease_text
+from models import db, Analysis, DiseaseInfo
+
+# Schema of the user and analysis tables before the catalogue existed
+LEGACY_SCHEMA = [
+    "CREATE TABLE user ("
+    " id INTEGER PRIMARY KEY, username VARCHAR(80) NOT NULL UNIQUE, email VARCHAR(120) NOT NULL UNIQUE,"
+    " password_hash VARCHAR(256) NOT NULL, full_name VARCHAR(100) NOT NULL, created_at DATETIME, is_active BOOLEAN)",
+    "CREATE TABLE analysis ("
+    " id INTEGER PRIMARY KEY, user_id INTEGER NOT NULL REFERENCES user (id), image_filename VARCHAR(255) NOT NULL,"
+    " disease_detected VARCHAR(100) NOT NULL, confidence FLOAT NOT NULL, severity VARCHAR(50) NOT NULL,"
+    " description TEXT NOT NULL, treatment TEXT NOT NULL, prevention TEXT NOT NULL, created_at DATETIME)",
+]
+
+EDITED = {
+    'name': 'Diseased Plant',
+    'description': 'Older wording of the diseased description.',
+    'treatment': 'Older treatment advice.',
+    'prevention': 'Older prevention advice.'
+}
+
+
+def make_app(path):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{path}'
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(app)
+    return app
+
+
+def insert_legacy_rows(path):
+    """Populate a pre-catalogue database: two current texts and one since-edited text."""
+    healthy = DiseaseAnalyzer.DISEASE_DATABASE['healthy']
+    diseased = DiseaseAnalyzer.DISEASE_DATABASE['diseased']
+    rows = [
+        (1, 'a.jpg', healthy, 'None'),
+        (2, 'b.jpg', diseased, 'High'),
+        (3, 'c.jpg', healthy, 'None'),
+        (4, 'd.jpg', EDITED, 'Low'),
+    ]
+
+    app = make_app(path)
+    with app.app_context():
+        with db.engine.begin() as connection:
+            for statement in LEGACY_SCHEMA:
+                connection.execute(text(statement))
+            connection.execute(text(
+                "INSERT INTO user (id, username, email, password_hash, full_name) "
+                "VALUES (1, 'demo', 'demo@example.com', 'x', 'Demo User')"
+            ))
+            for analysis_id, filename, info, severity in rows:
+                connection.execute(text(
+                    "INSERT INTO analysis (id, user_id, image_filename, disease_detected, confidence, severity,"
+                    " description, treatment, prevention) "
+                    "VALUES (:id, 1, :filename, :name, 90.0, :severity, :description, :treatment, :prevention)"
+                ), {'id': analysis_id, 'filename': filename, 'severity': severity, **info})
+    return app
+
+
+def migrate(app):
+    """The start-up sequence from app.py."""
+    with app.app_context():
+        db.create_all()
+        add_missing_columns(db)
+        DiseaseInfo.seed(DiseaseAnalyzer.DISEASE_DATABASE)
+        move_disease_text(db)
+        add_missing_indexes(db)
+
+
+def test_move_disease_text_maps_rows_to_catalogue():
+    with tempfile.TemporaryDirectory() as directory:
+        app = insert_legacy_rows(os.path.join(directory, 'legacy.db'))
+        migrate(app)
+
+        with app.app_context():
+            columns = {column['name'] for column in inspect(db.engine).get_columns('analysis')}
+            assert not columns & {'description', 'treatment', 'prevention'}, columns
+
+            keys = {analysis.id: analysis.disease_key for analysis in Analysis.query}
+            assert keys[1] == keys[3] == 'healthy', keys
+            assert keys[2] == 'diseased', keys
+
+            # Edited text becomes its own entry instead of being lost or merged
+            legacy = db.session.get(DiseaseInfo, keys[4])
+            assert keys[4].startswith('legacy_'), keys
+            assert (legacy.name, legacy.description, legacy.treatment, legacy.prevention) == \
+                (EDITED['name'], EDITED['description'], EDITED['treatment'], EDITED['prevention'])
+
+            healthy = db.session.get(Analysis, 1)
+            assert healthy.description == DiseaseAnalyzer.DISEASE_DATABASE['healthy']['description']
+            assert healthy.treatment == DiseaseAnalyzer.DISEASE_DATABASE['healthy']['treatment']
+
+
+def test_move_disease_text_runs_once():
+    with tempfile.TemporaryDirectory() as directory:
+        app = insert_legacy_rows(os.path.join(directory, 'legacy.db'))
+        migrate(app)
+        with app.app_context():
+            entries = DiseaseInfo.query.count()
+            keys = {analysis.id: analysis.disease_key for analysis in Analysis.query}
+
+        migrate(app)
+        with app.app_context():
+            assert DiseaseInfo.query.count() == entries
+            assert {analysis.id: analysis.disease_key for analysis in Analysis.query} == keys
+
+
+if __name__ == '__main__':
+    for test in (test_move_disease_text_maps_rows_to_catalogue,
+                 test_move_disease_text_runs_once):
+        test()
+        print(f"PASS {test.__name__}")
@@ -0,0 +1,117 @@
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+from PIL import Image, ImageOps, features
+
+logger = logging.getLogger(__name__)
+
+
+class ThumbnailCache:
+    """
+    Downscaled copies of uploaded images, generated on first request.
+
+    Thumbnails are stored as <directory>/<ab>/<cd>/<digest>_<size>.<ext>,
+    where the digest hashes the source filename. The two-level shard keeps
+    each directory small however many uploads accumulate. WebP is used when
+    Pillow supports it, JPEG otherwise. Once the cache grows past max_bytes,
+    the least recently served thumbnails are evicted; they are regenerated
+    if requested again.
+    """
+
+    def __init__(self, directory, sizes=(160, 320, 640, 1280), max_bytes=512 * 1024 * 1024, quality=80):
+        self.directory = directory
+        self.sizes = tuple(sorted(sizes))
+        self.max_bytes = int(max_bytes)
+        self.quality = quality
+        self.format, self.extension = ('WEBP', 'webp') if features.check('webp') else ('JPEG', 'jpg')
+        self.mimetype = f"image/{'webp' if self.format == 'WEBP' else 'jpeg'}"
+
+        self._lock = threading.Lock()
+        self._size_bytes = None
+        os.makedirs(directory, exist_ok=True)
+
+    def path_for(self, filename, size):
+        digest = hashlib.sha256(filename.encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, digest[:2], digest[2:4], f"{digest}_{size}.{self.extension}")
+
+    def get(self, source_path, size):
+        """
+        Path of the size-px thumbnail of source_path, creating it if needed.
+        Raises FileNotFoundError if the source image does not exist.
+        """
+        path = self.path_for(os.path.basename(source_path), size)
+        try:
+            # Serving counts as use for eviction
+            os.utime(path)
+            return path
+        except FileNotFoundError:
+            pass
+
+        self._generate(source_path, size, path)
+        return path
+
+    def _generate(self, source_path, size, path):
+        with Image.open(source_path) as img:
+            if img.format == 'JPEG':
+                # libjpeg DCT scaling: decode straight to at least twice the target size
+                img.draft('RGB', (size * 2, size * 2))
+            if img.getexif().get(0x0112, 1) != 1:
+                # Camera orientation tag: rotate like the browser does for the original
+                img = ImageOps.exif_transpose(img)
+            if img.mode not in ('RGB', 'RGBA') or (img.mode == 'RGBA' and self.format == 'JPEG'):
+                img = img.convert('RGB')
+            img.thumbnail((size, size), Image.Resampling.BICUBIC)
+
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Write then rename, so concurrent requests never serve a half-written file
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    img.save(f, self.format, quality=self.quality)
+                os.replace(tmp_path, path)
+            except BaseException:
+                os.remove(tmp_path)
+                raise
+
+        self._account(os.path.getsize(path))
+
+    def _account(self, added):
+        with self._lock:
+            if self._size_bytes is None:
+                self._size_bytes = sum(size for _, size, _ in self._scan())
+            else:
+                self._size_bytes += added
+            if self._size_bytes <= self.max_bytes:
+                return
+            self._size_bytes = self._evict()
+
+    def _scan(self):
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if name.endswith(self.extension):
+                    path = os.path.join(root, name)
+                    try:
+                        stat = os.stat(path)
+                    except FileNotFoundError:
+                        continue
+                    yield path, stat.st_size, stat.st_mtime
+
+    def _evict(self):
+        """Delete least recently used thumbnails down to 90% of max_bytes; returns the new total."""
+        entries = sorted(self._scan(), key=lambda entry: entry[2])
+        total = sum(size for _, size, _ in entries)
+        target = self.max_bytes * 0.9
+        removed = 0
+        for path, size, _ in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+        logger.info(f"Evicted {removed} thumbnails ({total / (1024 * 1024):.1f}MB cached)")
+        return total
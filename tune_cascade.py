@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Tune the rule-based -> CNN cascade on the labelled sets in test_images/ and xyz/.
+
+Every image is analysed once both ways, timing the cheap path (decode +
+colour features + rule verdict) and the model path (leaf crop, resize,
+forward pass) separately. The script then sweeps per-verdict rule
+confidence thresholds. For each pair it computes accuracy, the share of
+images still sent to the model, and the expected time per image. It prints
+the accuracy/throughput trade-off curve and writes the fastest thresholds
+whose accuracy is within --max-accuracy-drop of the model alone to
+models/cascade_thresholds.json.
+
+Serve with CASCADE=1 (the thresholds are tied to the model they were tuned
+against; re-run after retraining).
+
+Usage: python tune_cascade.py [--max-accuracy-drop 0.0] [--output models/cascade_thresholds.json]
+"""
+import argparse
+import json
+import logging
+import os
+import time
+import numpy as np
+from analysis import DiseaseAnalyzer
+from export_tflite import labelled_sets
+
+
+def measure(analyzer, items):
+    """Rule verdict, model verdict and per-path timings for each (path, label)."""
+    rows = []
+    for path, label in items:
+        start = time.perf_counter()
+        img = analyzer._open_image(path)
+        features, green_mask = analyzer._extract_features_and_mask(img)
+        rule_disease, rule_confidence, _ = analyzer._determine_disease(*features)
+        rules_done = time.perf_counter()
+
+        model_input = analyzer._prepare_model_input(img, green_mask)
+        score = analyzer._predict_scores(model_input[np.newaxis])[0]
+        model_disease = analyzer._classify_score(score)[0]
+        model_done = time.perf_counter()
+
+        rows.append({
+            'label': label,
+            'rule_disease': rule_disease,
+            'rule_confidence': rule_confidence,
+            'model_disease': model_disease,
+            'rule_ms': (rules_done - start) * 1000,
+            'model_ms': (model_done - rules_done) * 1000,
+        })
+    return rows
+
+
+def evaluate(rows, thresholds, rule_ms, model_ms):
+    """(accuracy %, share sent to the model, expected ms per image) for one threshold pair."""
+    correct = 0
+    to_model = 0
+    for row in rows:
+        threshold = thresholds[row['rule_disease']]
+        if threshold is not None and row['rule_confidence'] >= threshold:
+            correct += row['rule_disease'] == row['label']
+        else:
+            to_model += 1
+            correct += row['model_disease'] == row['label']
+    model_share = to_model / len(rows)
+    return correct / len(rows) * 100, model_share, rule_ms + model_share * model_ms
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Tune cascade thresholds on labelled images.')
+    parser.add_argument('--max-accuracy-drop', type=float, default=0.0,
+                        help='accuracy (percentage points) the cascade may lose against the model alone')
+    parser.add_argument('--output', default=DiseaseAnalyzer.CASCADE_THRESHOLDS_PATH)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    analyzer = DiseaseAnalyzer()
+    if not analyzer.model_loaded:
+        print(f"Model not available at {analyzer.model_path}; nothing to tune against")
+        return
+
+    items = [item for items in labelled_sets().values() for item in items]
+    rows = measure(analyzer, items)
+    rule_ms = float(np.mean([row['rule_ms'] for row in rows]))
+    model_ms = float(np.mean([row['model_ms'] for row in rows]))
+
+    candidates = {}
+    for disease in ('healthy', 'diseased'):
+        confidences = sorted({row['rule_confidence'] for row in rows if row['rule_disease'] == disease})
+        candidates[disease] = [None] + confidences
+
+    results = []
+    for healthy in candidates['healthy']:
+        for diseased in candidates['diseased']:
+            thresholds = {'healthy': healthy, 'diseased': diseased}
+            results.append((thresholds,) + evaluate(rows, thresholds, rule_ms, model_ms))
+
+    model_only = evaluate(rows, {'healthy': None, 'diseased': None}, rule_ms, model_ms)
+    rules_only = evaluate(rows, {'healthy': 0, 'diseased': 0}, rule_ms, model_ms)
+
+    # Trade-off curve: best accuracy at each share of images sent to the model
+    best = {}
+    for thresholds, accuracy, model_share, ms in results:
+        key = round(model_share, 3)
+        if key not in best or accuracy > best[key][1]:
+            best[key] = (thresholds, accuracy, model_share, ms)
+
+    print(f"{len(rows)} labelled images; rule path {rule_ms:.1f} ms, model path {model_ms:.1f} ms per image")
+    print("\n" + "=" * 84)
+    print("CASCADE ACCURACY / THROUGHPUT TRADE-OFF")
+    print("=" * 84)
+    print(f"{'healthy >=':>11} {'diseased >=':>12} {'to model':>9} {'accuracy':>9} {'ms/img':>8} {'img/s':>8}")
+    for thresholds, accuracy, model_share, ms in sorted(best.values(), key=lambda r: r[2]):
+        print(f"{str(thresholds['healthy']):>11} {str(thresholds['diseased']):>12} {model_share:>8.0%} "
+              f"{accuracy:>8.1f}% {ms:>8.1f} {1000 / ms:>8.1f}")
+    print("=" * 84)
+    print(f"Model only: {model_only[0]:.1f}%   Rules only: {rules_only[0]:.1f}%")
+
+    target = model_only[0] - args.max_accuracy_drop
+    acceptable = [r for r in results if r[1] >= target - 1e-9]
+    thresholds, accuracy, model_share, ms = min(acceptable, key=lambda r: (r[3], -r[1]))
+
+    with open(args.output, 'w') as f:
+        json.dump({
+            'thresholds': thresholds,
+            'accuracy': round(accuracy, 2),
+            'model_only_accuracy': round(model_only[0], 2),
+            'model_share': round(model_share, 4),
+            'images': len(rows),
+            'model_fingerprint': analyzer.model_fingerprint,
+        }, f, indent=2)
+    print(f"\nChosen: healthy >= {thresholds['healthy']}, diseased >= {thresholds['diseased']} "
+          f"({accuracy:.1f}% accuracy, {model_share:.0%} to the model, {1000 / ms:.1f} img/s) -> {args.output}")
+
+
+if __name__ == '__main__':
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    main()